@@ -0,0 +1,202 @@
+"""Aggregates module
+
+Keeps rolling window figures (sum, mean, week-on-week change, trend and
+rate per 100,000 people) for every metric of every area, updated as each
+new day arrives, so reading a figure never scans the data.
+
+Like the 7 day infections shown on the page, the window is the days
+before the newest day with a value, as the newest day is incomplete.
+
+Functions:
+    add_value -- adds or revises one day of a series
+    add_api_data -- adds the days of a Cov19API response
+    get_aggregates -- gets the figures of a series
+    clear -- forgets every series
+"""
+import datetime
+import threading
+
+from shared_functions import get_config
+
+# Fields of a data row that describe the area rather than a metric
+AREA_FIELDS = ('areaCode', 'areaName', 'areaType', 'date')
+DEFAULT_METRIC = 'newCasesBySpecimenDate'
+
+_series = {}
+_lock = threading.Lock()
+
+def _window_days() -> int:
+    """Get the number of days in a window (set in the config file)."""
+    return get_config().get('aggregates', {}).get('window_days', 7)
+
+def _new_series() -> dict:
+    """Make an empty series."""
+    return {
+        'values':{},
+        'anchor':None,
+        'current':0,
+        'previous':0,
+        'oldest_kept':''
+        }
+
+def _recount(series: dict, window: int) -> None:
+    """Count both windows again, after the anchor moved back or far."""
+    values = series['values']
+    anchor = series['anchor']
+    series['current'] = sum(
+        values.get(day) or 0 for day in range(anchor-window, anchor)
+        )
+    series['previous'] = sum(
+        values.get(day) or 0 for day in range(anchor-2*window, anchor-window)
+        )
+
+def _move_anchor(series: dict, anchor: int, window: int) -> None:
+    """Move the windows forward to end before a new anchor day."""
+    values = series['values']
+    if series['anchor'] is None or anchor-series['anchor'] > 2*window:
+        series['anchor'] = anchor
+        _recount(series, window)
+    else:
+        # Each day moves into the current window, one moves from it into
+        # the previous window and one leaves the previous window
+        while series['anchor'] < anchor:
+            day = series['anchor']
+            moved = values.get(day-window) or 0
+            series['current'] += (values.get(day) or 0)-moved
+            series['previous'] += moved-(values.get(day-2*window) or 0)
+            series['anchor'] = day+1
+
+    # Forget days that can't be in a window again
+    oldest = anchor-2*window
+    for day in [day for day in values if day < oldest]:
+        del values[day]
+    series['oldest_kept'] = datetime.date.fromordinal(oldest).isoformat()
+
+def _add(series: dict, day: int, value: int or None, window: int) -> None:
+    """Add or revise one day of a series (the lock must be held)."""
+    values = series['values']
+    anchor = series['anchor']
+    if anchor is not None and day < anchor-2*window:
+        return
+    old_value = values.get(day) or 0
+    values[day] = value
+
+    if value and (anchor is None or day > anchor):
+        _move_anchor(series, day, window)
+    elif day == anchor and not value:
+        # The newest day with a value has gone, find the one before it
+        days = [earlier for earlier in values if values[earlier]]
+        if days:
+            series['anchor'] = max(days)
+            _recount(series, window)
+        else:
+            series.update(_new_series())
+    elif anchor is not None:
+        if anchor-window <= day < anchor:
+            series['current'] += (value or 0)-old_value
+        elif anchor-2*window <= day < anchor-window:
+            series['previous'] += (value or 0)-old_value
+
+def add_value(
+    area_type: str,
+    area_name: str,
+    metric: str,
+    date: str,
+    value: int or None
+    ) -> None:
+    """Add or revise one day of a series.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area,
+        metric -- name of the metric,
+        date -- day of the value ("YYYY-MM-DD"),
+        value -- value of the day (None if not reported yet)
+    """
+    window = _window_days()
+    with _lock:
+        series = _series.setdefault(
+            (area_type, area_name, metric), _new_series()
+            )
+        _add(series, datetime.date.fromisoformat(date).toordinal(), value,
+             window)
+
+def add_api_data(covid_dict_data: dict) -> None:
+    """Add the days of a Cov19API response to the series of its areas.
+
+    Days too old to be in a window are skipped without being read.
+
+    Keyword arguements:
+        covid_dict_data -- Covid data from covid_API_request
+    """
+    window = _window_days()
+    with _lock:
+        for row in covid_dict_data.get('data') or []:
+            for metric, value in row.items():
+                if metric in AREA_FIELDS:
+                    continue
+                key = (row['areaType'], row['areaName'], metric)
+                series = _series.get(key)
+                if series is None:
+                    series = _series[key] = _new_series()
+                elif row['date'] < series['oldest_kept']:
+                    continue
+                _add(
+                    series,
+                    datetime.date.fromisoformat(row['date']).toordinal(),
+                    value,
+                    window
+                    )
+
+def get_aggregates(
+    area_type: str,
+    area_name: str,
+    metric: str = DEFAULT_METRIC
+    ) -> dict or None:
+    """Get the rolling window figures of a series.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area
+
+    Optional arguements:
+        metric -- name of the metric (new cases by default)
+
+    Return values:
+        figures -- dictionary of the newest value and its date, and the
+        sum, mean, change from the previous window, trend (that change
+        as a percentage) and sum per 100,000 people (if the population of
+        the area is in the config file) of the window, or None if the
+        series has no values
+    """
+    window = _window_days()
+    population = get_config().get('aggregates', {}).get(
+        'populations', {}
+        ).get(area_name)
+    with _lock:
+        series = _series.get((area_type, area_name, metric))
+        if not series or series['anchor'] is None:
+            return None
+        current = series['current']
+        previous = series['previous']
+        anchor = series['anchor']
+        latest = series['values'][anchor]
+
+    return {
+        'latest':latest,
+        'latest_date':datetime.date.fromordinal(anchor).isoformat(),
+        'sum':current,
+        'mean':round(current/window, 1),
+        'delta':current-previous,
+        'trend':(
+            round((current-previous)*100/previous, 1) if previous else None
+            ),
+        'per_100k':(
+            round(current*100_000/population, 1) if population else None
+            )
+        }
+
+def clear() -> None:
+    """Forget every series."""
+    with _lock:
+        _series.clear()
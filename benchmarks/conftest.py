@@ -0,0 +1,196 @@
+"""Fixtures for the benchmarks.
+
+Every benchmark runs offline, on the recorded nation_2021-10-28.csv or on
+synthetic csv files and API payloads of 10^3 to 10^7 rows (up to
+--benchmark-max-rows). Each benchmark also records its peak memory with
+tracemalloc, and fails if it is over the saved memory baseline. Once
+timings have been saved with --benchmark-save or --benchmark-autosave,
+each run is compared with the newest of them and fails if a benchmark
+has got more than 25% slower.
+"""
+import datetime
+import glob
+import json
+import os
+import random
+import tracemalloc
+
+import pytest
+
+HEADER = (
+    'areaCode,areaName,areaType,date,cumDailyNsoDeathsByDeathDate,'
+    'hospitalCases,newCasesBySpecimenDate'
+    )
+ROW_COUNTS = (10**3, 10**4, 10**5, 10**6, 10**7)
+# Days of data for each synthetic area
+AREA_DAYS = 1000
+# Bytes a peak memory can be over its baseline on top of the tolerance
+MEMORY_SLACK = 65536
+# Slowdown from the saved timings that fails a run
+TIMING_TOLERANCE = 'mean:25%'
+MEMORY_BASELINES = os.path.join(
+    os.path.dirname(__file__), 'memory_baselines.json'
+    )
+
+def pytest_addoption(parser):
+    group = parser.getgroup('dashboard benchmarks')
+    group.addoption(
+        '--benchmark-max-rows', type=int, default=10**5,
+        help='largest synthetic data set to benchmark (up to 10^7 rows)'
+        )
+    group.addoption(
+        '--memory-tolerance', type=float, default=0.25,
+        help='fraction a peak memory can be over its baseline'
+        )
+    group.addoption(
+        '--save-memory-baselines', action='store_true',
+        help='save the peak memory of each benchmark as its baseline'
+        )
+
+def pytest_configure(config):
+    """Compare with the newest saved timings, unless told otherwise."""
+    if not config.pluginmanager.hasplugin('benchmark'):
+        return
+    from pytest_benchmark.utils import get_machine_id, parse_compare_fail
+
+    option = config.option
+    if (
+        option.benchmark_disable or option.benchmark_compare or
+        option.benchmark_compare_fail
+        ):
+        return
+    storage = option.benchmark_storage
+    if not storage.startswith('file://'):
+        return
+    if glob.glob(os.path.join(
+        storage[len('file://'):], get_machine_id(), '*.json'
+        )):
+        option.benchmark_compare = True
+        option.benchmark_compare_fail = [parse_compare_fail(TIMING_TOLERANCE)]
+
+def pytest_generate_tests(metafunc):
+    if 'rows' in metafunc.fixturenames:
+        max_rows = metafunc.config.getoption('--benchmark-max-rows', 10**5)
+        counts = [count for count in ROW_COUNTS if count <= max_rows]
+        metafunc.parametrize('rows', counts, ids=[str(c) for c in counts])
+
+def synthetic_rows(rows: int):
+    """Make csv rows like the API's, newest first for each area."""
+    rng = random.Random(rows)
+    last_day = datetime.date(2021, 10, 28).toordinal()
+    for row in range(rows):
+        area, day = divmod(row, AREA_DAYS)
+        # Like the real data, the newest days are not complete yet
+        deaths = '' if day < 14 else str(150_000-day*10)
+        cases = '' if day == 0 else str(rng.randrange(20_000, 50_000))
+        yield (
+            'E'+str(area).zfill(8)+',Area '+str(area)+',ltla,'+
+            datetime.date.fromordinal(last_day-day).isoformat()+','+
+            deaths+','+str(rng.randrange(5_000, 8_000))+','+cases
+            )
+
+@pytest.fixture(scope='session')
+def nation_csv():
+    return os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'nation_2021-10-28.csv'
+        )
+
+@pytest.fixture(scope='session')
+def csv_files(tmp_path_factory):
+    """Get a synthetic csv file of a number of rows, made once."""
+    files = {}
+    def get_csv_file(rows: int) -> str:
+        if rows not in files:
+            path = tmp_path_factory.mktemp('csv') / (str(rows)+'.csv')
+            with open(path, 'w', encoding='utf8') as csv_file:
+                csv_file.write(HEADER+'\n')
+                for row in synthetic_rows(rows):
+                    csv_file.write(row+'\n')
+            files[rows] = str(path)
+        return files[rows]
+    return get_csv_file
+
+@pytest.fixture(scope='session')
+def api_payloads():
+    """Get a synthetic Cov19API json payload of a number of rows."""
+    payloads = {}
+    columns = HEADER.split(',')
+    def get_api_payload(rows: int) -> dict:
+        if rows not in payloads:
+            data = []
+            for row in synthetic_rows(rows):
+                values = dict(zip(columns, row.split(',')))
+                for metric in columns[4:]:
+                    values[metric] = (
+                        int(values[metric]) if values[metric] else None
+                        )
+                data.append(values)
+            payloads[rows] = {'data':data, 'length':len(data)}
+        return payloads[rows]
+    return get_api_payload
+
+@pytest.fixture(scope='session')
+def memory_baselines(request):
+    try:
+        with open(MEMORY_BASELINES, 'r', encoding='utf8') as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+    yield baselines
+    if request.config.getoption('--save-memory-baselines', False):
+        with open(MEMORY_BASELINES, 'w', encoding='utf8') as baseline_file:
+            json.dump(baselines, baseline_file, indent=4, sort_keys=True)
+            baseline_file.write('\n')
+
+@pytest.fixture
+def measure(benchmark, memory_baselines, request):
+    """Benchmark a function, recording its throughput and peak memory.
+
+    Call with the number of rows processed, the function and its
+    arguements, and optionally a setup function run before each call.
+    The peak memory is measured on a separate call, so tracemalloc
+    doesn't slow the timed calls.
+    """
+    def run(
+        rows: int,
+        function: callable,
+        *args,
+        setup: callable = None,
+        **kwargs
+        ):
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            function(*args, **kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        if setup:
+            result = benchmark.pedantic(
+                function, args=args, kwargs=kwargs, setup=setup, rounds=20
+                )
+        else:
+            result = benchmark(function, *args, **kwargs)
+        benchmark.extra_info['rows'] = rows
+        benchmark.extra_info['peak_memory_bytes'] = peak
+        if benchmark.stats:
+            benchmark.extra_info['rows_per_second'] = (
+                rows/benchmark.stats.stats.mean
+                )
+
+        # Compare the peak memory with the baseline
+        name = request.node.name
+        if request.config.getoption('--save-memory-baselines', False):
+            memory_baselines[name] = peak
+        elif name in memory_baselines:
+            limit = memory_baselines[name]*(
+                1+request.config.getoption('--memory-tolerance', 0.25)
+                )+MEMORY_SLACK
+            assert peak <= limit, (
+                name+' peak memory '+str(peak)+' bytes is over its '
+                'baseline of '+str(memory_baselines[name])+' bytes'
+                )
+        return result
+    return run
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from covid_data_handler import parse_csv_data
+from covid_data_handler import process_covid_csv_data
+from covid_data_handler import process_covid_csv_stream
+from covid_data_handler import process_covid_local_dict_data
+from covid_data_handler import process_covid_country_dict_data
+
+def test_parse_csv_data_nation(measure, nation_csv):
+    measure(639, parse_csv_data, nation_csv)
+
+def test_process_covid_csv_data_nation(measure, nation_csv):
+    csv_lines = parse_csv_data(nation_csv)
+    assert measure(639, process_covid_csv_data, csv_lines) == (
+        240_299, 7_019, 141_544
+        )
+
+def test_parse_csv_data(measure, csv_files, rows):
+    measure(rows, parse_csv_data, csv_files(rows))
+
+def test_process_covid_csv_data(measure, csv_files, rows):
+    csv_lines = parse_csv_data(csv_files(rows))
+    measure(rows, process_covid_csv_data, csv_lines)
+
+def test_process_covid_csv_stream(measure, csv_files, rows):
+    measure(rows, process_covid_csv_stream, csv_files(rows))
+
+def test_process_covid_local_dict_data(measure, api_payloads, rows):
+    location, _infections = measure(
+        rows, process_covid_local_dict_data, api_payloads(rows)
+        )
+    assert location == 'Area 0'
+
+def test_process_covid_country_dict_data(measure, api_payloads, rows):
+    measure(rows, process_covid_country_dict_data, api_payloads(rows))
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import covid_news_handling
+
+def clear_headlines():
+    covid_news_handling.headlines.clear()
+    covid_news_handling.headline_titles.clear()
+    covid_news_handling.deleted_headlines.clear()
+
+@pytest.mark.parametrize('articles', [10**3, 10**4])
+def test_update_news(measure, monkeypatch, articles):
+    # Every article is fetched twice, half with a url and half without
+    fetched = [
+        {
+            'title':'Headline '+str(article),
+            'content':'Content '+str(article),
+            'url':'https://news.test/'+str(article) if article % 2 else None
+            }
+        for article in range(articles//2)
+        ]*2
+    monkeypatch.setattr(
+        covid_news_handling, 'news_API_request', lambda: fetched
+        )
+    measure(
+        articles, covid_news_handling.update_news, setup=clear_headlines
+        )
+    assert len(covid_news_handling.get_news()) == min(
+        articles//2, covid_news_handling.get_config().get('max_headlines', 100)
+        )
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# Importing main doesn't fetch data or start the scheduler
+import main
+import covid_data_handler
+import covid_news_handling
+import snapshot_store
+
+@pytest.fixture(scope='module')
+def client(api_payloads):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(main, '_role', snapshot_store.STANDALONE)
+        yield _client(api_payloads)
+    # Forget the made up headlines
+    with covid_news_handling.headlines_lock:
+        covid_news_handling.headlines.clear()
+        covid_news_handling._publish_headlines()
+
+def _client(api_payloads):
+    """Show made up data and headlines, then get a test client."""
+    covid_data_handler.set_covid_data(
+        api_payloads(1000), api_payloads(1000), [
+            {'location':'Area '+str(area), 'local_7day_infections':area}
+            for area in range(10)
+            ]
+        )
+    covid_news_handling.headlines.clear()
+    covid_news_handling.headlines.update({
+        str(article): covid_news_handling.Headline(
+            'Headline '+str(article), 'Content', 'https://news.test/'
+            )
+        for article in range(10)
+        })
+    with covid_news_handling.headlines_lock:
+        covid_news_handling._publish_headlines()
+    return main.app.test_client()
+
+def clear_page_cache():
+    main.page_cache = (None, {}, {})
+
+def test_render_page(measure, client):
+    response = measure(1, client.get, '/', setup=clear_page_cache)
+    assert response.status_code == 200
+
+def test_render_page_cached(measure, client):
+    measure(1, client.get, '/')
+
+def test_render_page_not_modified(measure, client):
+    etag = client.get('/').headers['ETag']
+    response = measure(
+        1, client.get, '/', headers={'If-None-Match':etag}
+        )
+    assert response.status_code == 304
@@ -0,0 +1,250 @@
+"""Bulk ingest module
+
+Saves a whole folder of Covid data csv files (like nation_2021-10-28.csv)
+into the Covid data store. Files are read in chunks across a pool of
+processes, then their series are merged into one time series for each
+area and metric. On days they share, the newer export (by the newest
+date of the area in it) wins, even over data saved by earlier runs or
+fetched from the API. Files already ingested, by modification time and
+size or by hash, are skipped, and files that can't be read are logged
+and left to try again next time.
+
+Run this module to ingest a folder:
+    python bulk_ingest.py FOLDER [--workers N] [--pattern GLOB]
+
+Functions:
+    read_csv_file -- reads the series of one csv file
+    ingest_directory -- ingests every new csv file of a folder
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import covid_store
+import logger
+from covid_data_handler import csv_columns
+from shared_functions import get_config
+
+MANIFEST = 'ingest_manifest.json'
+# Bytes read at a time when hashing a file
+HASH_CHUNK_BYTES = 1048576
+
+def _file_hash(path: str) -> str:
+    """Get the sha256 hash of a file."""
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as csv_file:
+        for chunk in iter(lambda: csv_file.read(HASH_CHUNK_BYTES), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def read_csv_file(path: str) -> tuple[str, int, dict]:
+    """Read the series of one csv file.
+
+    The file is split into typed columns a chunk of lines at a time (see
+    covid_data_handler.csv_columns).
+
+    Keyword arguements:
+        path -- path of the csv file
+
+    Return values:
+        file_hash -- sha256 hash of the file,
+        rows -- number of rows read,
+        areas -- dictionary of (area type, area name) to (area code,
+        dictionary of metric to dictionary of "YYYY-MM-DD" to value),
+        leaving out blank cells and columns that aren't whole numbers
+    """
+    file_hash = _file_hash(path)
+    with open(path, encoding='utf8') as csv_file:
+        columns = csv_columns(csv_file)
+    missing = [
+        field for field in covid_store.AREA_FIELDS if field not in columns
+        ]
+    if missing:
+        raise ValueError('Missing columns '+', '.join(missing))
+
+    names = columns['areaName'][0]
+    types = columns['areaType'][0]
+    codes = columns['areaCode'][0]
+    dates = columns['date'][0]
+    metrics = [
+        (metric, values, mask) for metric, (values, mask) in columns.items()
+        if metric not in covid_store.AREA_FIELDS
+        and isinstance(values, array)
+        ]
+
+    areas = {}
+    for row, area in enumerate(zip(types, names)):
+        if area not in areas:
+            areas[area] = (codes[row], {metric: {} for metric, *_ in metrics})
+        area_metrics = areas[area][1]
+        for metric, values, mask in metrics:
+            if mask[row]:
+                area_metrics[metric][dates[row]] = values[row]
+    return file_hash, len(dates), areas
+
+def _load_manifest() -> dict:
+    """Get the manifest of ingested files."""
+    try:
+        with open(
+            os.path.join(covid_store._directory(), MANIFEST),
+            'r', encoding='utf8'
+            ) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+def _save_manifest(manifest: dict) -> None:
+    """Save the manifest of ingested files."""
+    covid_store._write_file(
+        MANIFEST, json.dumps(manifest, indent=4).encode('utf8')
+        )
+
+def _merge(merged: dict, area: tuple, area_code: str, metrics: dict) -> None:
+    """Merge the series of an area into the series of older exports."""
+    if area not in merged:
+        merged[area] = (area_code, {})
+    merged_metrics = merged[area][1]
+    for metric, values_by_date in metrics.items():
+        merged_metrics.setdefault(metric, {}).update(values_by_date)
+
+def _export_date(metrics: dict) -> str:
+    """Get the newest date of an area in an export."""
+    return max(
+        (max(values_by_date) for values_by_date in metrics.values()
+         if values_by_date),
+        default=''
+        )
+
+def ingest_directory(
+    directory: str,
+    workers: int = None,
+    pattern: str = '*.csv'
+    ) -> dict:
+    """Save every new csv file of a folder to the Covid data store.
+
+    Keyword arguements:
+        directory -- folder of csv files
+
+    Optional arguements:
+        workers -- number of processes (one per CPU by default),
+        pattern -- glob pattern of the files to ingest
+
+    Return values:
+        report -- dictionary of the number of files ingested, skipped and
+        failed, rows read, seconds taken and rows per second
+    """
+    start = time.perf_counter()
+    manifest = _load_manifest()
+
+    # Find the files that are new or have changed
+    paths = []
+    skipped = 0
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        stat = os.stat(path)
+        entry = manifest.get(os.path.abspath(path))
+        if entry and (entry['mtime'], entry['size']) == (
+            stat.st_mtime, stat.st_size
+            ):
+            skipped += 1
+        else:
+            paths.append(path)
+
+    # Read the files across the pool
+    logger.log_infomation('Ingesting '+str(len(paths))+' csv files')
+    hashes = {entry['hash'] for entry in manifest.values()}
+    exports = []
+    failed = 0
+    if paths:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(read_csv_file, path) for path in paths]
+            for path, future in zip(paths, futures):
+                try:
+                    file_hash, file_rows, areas = future.result()
+                except Exception as error:
+                    # Leave the file out of the manifest to try it again
+                    logger.log_error(
+                        'Could not ingest '+path+': '+str(error)
+                        )
+                    manifest.pop(os.path.abspath(path), None)
+                    failed += 1
+                    continue
+                stat = os.stat(path)
+                manifest[os.path.abspath(path)] = {
+                    'mtime':stat.st_mtime,
+                    'size':stat.st_size,
+                    'hash':file_hash,
+                    'rows':file_rows
+                    }
+                # Skip files with the same contents as an ingested one
+                if file_hash in hashes:
+                    skipped += 1
+                else:
+                    hashes.add(file_hash)
+                    exports.append((path, file_rows, areas))
+
+    # Merge the areas oldest export first, keeping the saved days of
+    # areas with newer data in the store
+    newer = {}
+    older = {}
+    newest = {}
+    for area_export, path, area, area_code, metrics in sorted(
+        (_export_date(metrics), path, area, area_code, metrics)
+        for path, _file_rows, areas in exports
+        for area, (area_code, metrics) in areas.items()
+        ):
+        if area not in newest:
+            newest[area] = covid_store.latest_date(*area) or ''
+        if area_export >= newest[area]:
+            newest[area] = area_export
+            _merge(newer, area, area_code, metrics)
+        else:
+            _merge(older, area, area_code, metrics)
+    rows = sum(file_rows for _path, file_rows, _areas in exports)
+
+    if newer or older:
+        covid_store.store_areas(newer, merge=True, older=older)
+    _save_manifest(manifest)
+
+    seconds = time.perf_counter()-start
+    report = {
+        'files':len(exports),
+        'skipped':skipped,
+        'failed':failed,
+        'rows':rows,
+        'seconds':round(seconds, 3),
+        'rows_per_second':round(rows/seconds) if seconds else 0
+        }
+    logger.log_infomation('Ingested csv files: '+json.dumps(report))
+    return report
+
+if __name__ == '__main__':
+    settings = get_config().get('bulk_ingest', {})
+    parser = argparse.ArgumentParser(
+        description='Save a folder of Covid data csv files to the store.'
+        )
+    parser.add_argument('directory', help='folder of csv files')
+    parser.add_argument(
+        '--workers', type=int, default=settings.get('workers'),
+        help='number of processes (one per CPU by default)'
+        )
+    parser.add_argument(
+        '--pattern', default=settings.get('pattern', '*.csv'),
+        help='glob pattern of the files to ingest'
+        )
+    arguements = parser.parse_args()
+    ingest_report = ingest_directory(
+        arguements.directory, arguements.workers, arguements.pattern
+        )
+    print(
+        'Ingested '+str(ingest_report['files'])+' files ('+
+        str(ingest_report['skipped'])+' skipped, '+
+        str(ingest_report['failed'])+' failed), '+
+        str(ingest_report['rows'])+' rows in '+
+        str(ingest_report['seconds'])+' s: '+
+        str(ingest_report['rows_per_second'])+' rows/s'
+        )
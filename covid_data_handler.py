@@ -2,36 +2,67 @@
 
 Fuctions:
     parse_csv_data -- gets CSV data from file
+    parse_csv_columns -- gets typed columns from a CSV file
     process_covid_csv_data -- gets specific data from the covid data
+    process_covid_csv_columns -- gets specific data from covid columns
+    process_covid_csv_stream -- gets specific data in one pass over a CSV
+    get_covid_api -- gets the Cov19API class
     covid_API_request -- makes a API request to Cov19API
+    covid_API_delta_request -- gets the newest Covid data from Cov19API
     schedule_covid_updates -- schedules updates
+    fetch_covid_data -- gets covid data for several locations at once
+    fetch_area_infections -- gets the infections of many areas in batches
     update_covid_data -- gets updated covid data
+    load_stored_covid_data -- gets covid data saved by earlier runs
+    set_covid_data -- sets the covid data from API data
     process_covid_local_dict_data -- gets specific local covid data
     process_covid_country_dict_data -- gets specific national covid data
     get_updates -- gets uncompleted updates
-    schedule_check_data -- runs scheduler
+    run_data_update -- runs a scheduled update
     get_covid_data -- gets formatted covid data
+    get_covid_snapshot -- gets the covid data with its version
+    get_version -- gets the version of the data and updates
     remove_data_update -- removes future update
     set_repeating_data_update -- makes an update repeat
 """
 import time
-import sched
-import json
-
-from uk_covid19 import Cov19API
-
+import datetime
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import aggregates
+import covid_store
+import query_plan
 import logger
+import metrics
+import response_cache
+import scheduler
+
+from shared_functions import (
+    add_scheduled_update,
+    complete_scheduled_update,
+    is_scheduled,
+    list_scheduled_updates,
+    get_config,
+    new_update_registry,
+    remove_scheduled_update,
+    set_scheduled_event,
+    set_scheduled_repeat,
+    time_format
+    )
 
-from shared_functions import remove_scheduled_update, time_format
-
-# Load config file
-with open("config.json", 'r', encoding='utf8') as config:
-    configerables = json.load(config)
-
+# Plan of the figures read from csv files
+_CSV_PLAN = query_plan.compile_plan(query_plan.DEFAULT_SPEC)
 # Declare global variables
-updates = []
-covid_data = {}
-schedule = sched.scheduler(time.time, time.sleep)
+updates = new_update_registry()
+# Version and covid data, published together and never changed after
+covid_snapshot = (0, {})
+# Number of areas of each location type, asked for once
+_area_counts = {}
+
+# Number of csv lines split and converted together
+CSV_CHUNK_LINES = 65536
 
 def parse_csv_data(csv_filename: str) -> list:
     """Get a list of strings for each line of the file.
@@ -46,11 +77,72 @@ def parse_csv_data(csv_filename: str) -> list:
         csv_data = csv_file.readlines()
     return csv_data
 
+def parse_csv_columns(csv_filename: str) -> dict:
+    """Get typed columns for each header of the file in a single pass.
+
+    Keyword arguements:
+        csv_filename -- csv data filename
+
+    Return values:
+        columns -- dictionary of header to (values, null mask)
+    """
+    with open(csv_filename, encoding='utf8') as csv_file:
+        columns = csv_columns(csv_file)
+    return columns
+
+def csv_columns(csv_lines) -> dict:
+    """Convert lines of a csv file into typed columns.
+
+    Integer columns are stored in an array with blank cells set to 0,
+    any other column is kept as a list of strings. Every column has a
+    bytearray mask which is 1 where the cell was not blank.
+
+    Keyword arguements:
+        csv_lines -- iterable of lines from a csv file, header first
+
+    Return values:
+        columns -- dictionary of header to (values, null mask)
+    """
+    lines = iter(csv_lines)
+    header = next(lines).strip().split(",")
+    width = len(header)
+    columns = {name: (array('q'), bytearray()) for name in header}
+    names = list(columns)
+
+    # Split a chunk of lines, then convert each column of it at once
+    chunk = list(islice(lines, CSV_CHUNK_LINES))
+    while chunk:
+        rows = [line.strip().split(",") for line in chunk]
+        if any(len(row) != width for row in rows):
+            rows = [(row + ['']*width)[:width] for row in rows]
+        for name, cells in zip(names, zip(*rows)):
+            values, mask = columns[name]
+            mask.extend(map(bool, cells))
+            if isinstance(values, array):
+                try:
+                    values.extend([int(cell) if cell else 0 for cell in cells])
+                except ValueError:
+                    # Not a number column, so keep the text instead
+                    values = [
+                        str(value) if filled else ''
+                        for value, filled in zip(values, mask)
+                        ]
+                    values.extend(cells)
+                    columns[name] = (values, mask)
+            else:
+                values.extend(cells)
+        chunk = list(islice(lines, CSV_CHUNK_LINES))
+
+    return columns
+
 def process_covid_csv_data(
     covid_csv_data: list
     ) -> tuple[int, int, int]:
     """Get cases, hospital cases and deaths from the Covid data.
 
+    Only the three columns are read, stopping once they are known (use
+    process_covid_csv_columns when every column is needed).
+
     Keyword arguements:
         covid_csv_data -- list of strings of lines from a csv file
 
@@ -59,67 +151,298 @@ def process_covid_csv_data(
         current_hospital_cases -- number of current hospital cases,
         total_deaths -- total number of covid related deaths
     """
-    # Calculate the last 7 day cases
+    return process_covid_csv_stream(covid_csv_data)
+
+def process_covid_csv_columns(
+    covid_csv_columns: dict
+    ) -> tuple[int, int, int]:
+    """Get cases, hospital cases and deaths from the Covid data columns.
+
+    Columns are found by their headers, as named in the default metric
+    spec of query_plan.
+
+    Keyword arguements:
+        covid_csv_columns -- columns from csv_columns or parse_csv_columns
+
+    Return values:
+        last7days_cases -- number of covid cases in the last 7 days,
+        current_hospital_cases -- number of current hospital cases,
+        total_deaths -- total number of covid related deaths
+    """
+    spec = query_plan.DEFAULT_SPEC
+    cases = covid_csv_columns[spec['infections_7day']['metric']]
+    hospital = covid_csv_columns[spec['hospital_cases']['metric']]
+    deaths = covid_csv_columns[spec['deaths']['metric']]
+
+    # Calculate the last 7 day cases (skipping the incomplete first day)
+    start = cases[1].find(1)
     last7days_cases = 0
-    start = 1
-    while not covid_csv_data[start].strip().split(",")[-1]:
-        start += 1
-    start += 1
-    for count in range(7):
-        day = covid_csv_data[count+start].strip().split(",")[-1]
-        last7days_cases += int(day)
+    if start != -1:
+        last7days_cases = sum(cases[0][start+1:start+8])
 
     # Get the latest hospital cases
-    index = 1
-    while not covid_csv_data[index].strip().split(",")[-2]:
-        index += 1
-    current_hospital_cases = int(covid_csv_data[index].strip().split(",")[-2])
+    index = hospital[1].find(1)
+    if index != -1:
+        current_hospital_cases = hospital[0][index]
+    else:
+        logger.log_warning('No hospital cases found')
+        current_hospital_cases = 0
 
     # Get the latest total deaths
-    found = False
-    row = 1
-    while not found and row < len(covid_csv_data):
-        total_deaths = covid_csv_data[row].strip().split(",")[-3]
-        if  total_deaths:
-            found = True
-            total_deaths = int(total_deaths)
-        row += 1
-    if not found:
+    index = deaths[1].find(1)
+    total_deaths = deaths[0][index] if index != -1 else 0
+
+    return last7days_cases, current_hospital_cases, total_deaths
+
+def process_covid_csv_stream(csv_source) -> tuple[int, int, int]:
+    """Get cases, hospital cases and deaths in one pass over the Covid data.
+
+    Rows are read one at a time and reading stops as soon as all three
+    values are known, so only the start of large files is read. Only the
+    three columns are converted from text.
+
+    Keyword arguements:
+        csv_source -- csv data filename or an iterable of csv lines
+
+    Return values:
+        last7days_cases -- number of covid cases in the last 7 days,
+        current_hospital_cases -- number of current hospital cases,
+        total_deaths -- total number of covid related deaths
+    """
+    figures = query_plan.run_csv(_CSV_PLAN, csv_source)
+    last7days_cases = figures['infections_7day']
+    current_hospital_cases = figures['hospital_cases']
+    total_deaths = figures['deaths']
+
+    if current_hospital_cases is None:
+        logger.log_warning('No hospital cases found')
+        current_hospital_cases = 0
+    if total_deaths is None:
         total_deaths = 0
 
     return last7days_cases, current_hospital_cases, total_deaths
 
+def get_covid_api() -> type:
+    """Get the Cov19API class, using the config file's endpoint."""
+    from uk_covid19 import Cov19API
+    Cov19API.endpoint = get_config().get(
+        'covid_api_endpoint', Cov19API.endpoint
+        )
+    return Cov19API
+
 def covid_API_request(
-    location: str = configerables['location'],
-    location_type: str = configerables['location_type']) -> dict:
+    location: str = None,
+    location_type: str = None,
+    incremental: bool = False) -> dict:
     """Get up-to-date Covid data as a dictionary.
 
     Optional arguements:
-        location -- location to get data from,
-        location_type -- type of location to get data from
+        location -- location to get data from (None with a location_type
+        for every area of that type in one request),
+        location_type -- type of location to get data from (both default
+        to the config file's location),
+        incremental -- only fetch the days newer than the stored data
     """
+    # Default to the location in the config file
+    if location_type is None:
+        location_type = get_config()['location_type']
+        if location is None:
+            location = get_config()['location']
+    return response_cache.cached_request(
+        'covid',
+        (location, location_type),
+        lambda: _covid_API_fetch(location, location_type, incremental)
+        )
+
+@metrics.timed('covid_API_request')
+def _covid_API_fetch(
+    location: str,
+    location_type: str,
+    incremental: bool) -> dict:
+    """Get Covid data from Cov19API, bypassing the response cache."""
     # Set up search terms
-    filters = ['areaType='+location_type, 'areaName='+location]
-    metrics = {
-        'areaCode':'areaCode',
-        'areaName':'areaName',
-        'areaType':'areaType',
-        'date':'date',
-        'cumDailyNsoDeathsByDeathDate':'cumDailyNsoDeathsByDeathDate',
-        'hospitalCases':'hospitalCases',
-        'newCasesBySpecimenDate':'newCasesBySpecimenDate'
-    }
+    filters = ['areaType='+location_type]
+    if location:
+        filters.append('areaName='+location)
+    # Only fetch the metrics in the metric spec
+    structure = query_plan.api_structure(query_plan.get_plan())
+
+    # Try to only get the latest days
+    if incremental:
+        json_data = covid_API_delta_request(
+            location_type, location, filters, structure
+            )
+        if json_data:
+            return json_data
+        logger.log_infomation('Fetching full covid data instead')
 
     # Get data from API
     logger.log_infomation('Getting covid data')
-    new_data = Cov19API(filters=filters, structure=metrics)
+    new_data = get_covid_api()(filters=filters, structure=structure)
     json_data = new_data.get_json()
 
     if not json_data:
         logger.log_error('No covid API data')
+    else:
+        covid_store.store_api_data(json_data)
 
     return json_data
 
+def covid_API_delta_request(
+    location_type: str,
+    location: str,
+    filters: list,
+    structure: dict
+    ) -> dict or None:
+    """Get the days missing from the stored Covid data and merge them in.
+
+    The last few stored days are fetched again, as recent days are still
+    being revised, as are the days with metrics that are reported late
+    (such as deaths). If the oldest of those days has also changed, older
+    history may have been revised so None is returned for a full fetch.
+
+    Keyword arguements:
+        location_type -- type of location to get data from,
+        location -- location to get data from (None for every stored area
+        of the type, fetched together),
+        filters -- search filters for the location,
+        structure -- structure of the data to get
+
+    Return values:
+        json_data -- the stored data with the new days merged in, or None
+        if a full fetch is needed
+    """
+    if location:
+        area_names = [location]
+    else:
+        area_names = covid_store.area_names(location_type)
+    latest_dates = [
+        covid_store.latest_date(location_type, area_name)
+        for area_name in area_names
+        ]
+    if not latest_dates or not all(latest_dates):
+        return None
+    # Start from the area furthest behind, so every area is brought up
+    latest = min(latest_dates)
+    first_day = (
+        datetime.date.fromisoformat(latest) -
+        datetime.timedelta(days=get_config().get('revision_window_days', 7))
+        )
+    oldest_day = (
+        datetime.date.today() -
+        datetime.timedelta(days=get_config().get('max_delta_days', 28)-1)
+        )
+    if first_day < oldest_day:
+        logger.log_warning('Stored covid data is too old to update')
+        return None
+
+    # Go back to the oldest day still waiting for a late metric
+    stored_rows = {}
+    for area_name in area_names:
+        rows = covid_store.to_api_data(location_type, area_name)['data']
+        pending_day = _oldest_pending_day(rows, oldest_day.isoformat())
+        if pending_day:
+            first_day = min(
+                first_day, datetime.date.fromisoformat(pending_day)
+                )
+        for row in rows:
+            stored_rows[(area_name, row['date'])] = row
+    days = (datetime.date.today()-first_day).days + 1
+
+    # Get each day after the start of the window
+    logger.log_infomation(
+        'Getting new covid data since '+first_day.isoformat()
+        )
+    new_rows = _fetch_days(filters, structure, [
+        (first_day+datetime.timedelta(days=day)).isoformat()
+        for day in range(days)
+        ])
+    if new_rows is None:
+        return None
+
+    # Areas new to the store need their whole history
+    if any(row['areaName'] not in area_names for row in new_rows):
+        logger.log_infomation('New areas in the covid data')
+        return None
+
+    # Find the stored days that have been revised (not just filled in)
+    revised = []
+    for row in new_rows:
+        stored_row = stored_rows.get((row['areaName'], row['date']))
+        if stored_row and any(
+            stored_row.get(field) not in (None, value)
+            for field, value in row.items()
+            ):
+            revised.append(row['date'])
+    revised.sort()
+    if revised:
+        logger.log_infomation(
+            'Covid data revised on '+str(len(revised))+' days'
+            )
+        # Revisions reaching the start of the window may go back further
+        if revised[0] <= first_day.isoformat():
+            logger.log_warning('Covid data history has been revised')
+            return None
+
+    if new_rows:
+        covid_store.store_api_data({'data':new_rows}, merge=True)
+    if location:
+        return covid_store.to_api_data(location_type, location)
+    data = []
+    for area_name in area_names:
+        data.extend(covid_store.to_api_data(location_type, area_name)['data'])
+    return {'data':data, 'length':len(data)}
+
+def _oldest_pending_day(rows: list, since: str) -> str or None:
+    """Find the oldest day missing a metric that older days have.
+
+    Keyword arguements:
+        rows -- stored rows of an area, newest first,
+        since -- oldest day to look at ("YYYY-MM-DD")
+
+    Return values:
+        date -- the oldest day with a metric not reported yet, or None
+    """
+    reported = set()
+    for row in reversed(rows):
+        metrics_missing = False
+        for field, value in row.items():
+            if field in aggregates.AREA_FIELDS:
+                continue
+            if value is not None:
+                reported.add(field)
+            elif field in reported:
+                metrics_missing = True
+        if metrics_missing and row['date'] >= since:
+            return row['date']
+    return None
+
+def _fetch_days(filters: list, structure: dict, dates: list) -> list or None:
+    """Get the rows of several days from Cov19API at the same time.
+
+    Return values:
+        rows -- rows of every day, or None if any request failed
+    """
+    Cov19API = get_covid_api()
+
+    def request(date: str) -> list:
+        day_data = Cov19API(
+            filters=filters+['date='+date], structure=structure
+            ).get_json()
+        return (day_data or {}).get('data') or []
+
+    max_workers = min(
+        len(dates), get_config().get('max_fetch_workers', 8)
+        ) or 1
+    try:
+        with metrics.measure('covid_API_day_requests'):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                day_rows = list(executor.map(request, dates))
+    except Exception as error:
+        logger.log_error('Covid API day request failed: '+str(error))
+        return None
+    return [row for rows in day_rows for row in rows]
+
 def schedule_covid_updates(
     update_interval: str,
     update_name: str
@@ -130,8 +453,6 @@ def schedule_covid_updates(
         update_interval -- time of day the update takes place
         update_name -- name of the update
     """
-    global updates
-
     # Format the update_iterval.
     if isinstance(update_interval, str):
         formated_time = time_format(update_interval)
@@ -146,47 +467,253 @@ def schedule_covid_updates(
     update = {
         'title':update_name,
         'content':readable_schedule_time,
-        'schedule':schedule,
         'time':schedule_time,
         'interval':update_interval,
         'repeat':False,
         'type':'data'
         }
 
-    # Add update to updates list if it's not a repeat.
-    repeat = False
-    for current_update in updates:
-        if update['time'] == current_update['time']:
-            logger.log_warning('Data update already at specified time')
-            repeat = True
-    if not repeat:
-        updates.append(update)
-        schedule.enter(schedule_time-current_time_s, 1, update_covid_data)
-        updates = sorted(updates, key=lambda x:x['time'])
+    # Add update to updates if it's not a repeat.
+    if add_scheduled_update(update, updates):
+        set_scheduled_event(update, scheduler.enter(
+            schedule_time-current_time_s, run_data_update, (update,)
+            ), updates)
+    else:
+        logger.log_warning(
+            'Data update already at specified time or with that name'
+            )
+
+def run_data_update(update: dict) -> None:
+    """Run a scheduled data update, then repeat it or mark it completed.
+
+    Keyword arguements:
+        update -- the scheduled update
+    """
+    # Skip updates that have been removed
+    if not is_scheduled(update, updates):
+        return
+
+    try:
+        update_covid_data()
+    finally:
+        # Remove update from updates, and schedule it again if needed
+        complete_scheduled_update(update, updates)
+        if update['repeat']:
+            schedule_covid_updates(update['interval'], update['title'])
+            set_repeating_data_update(update['title'])
+
+def fetch_covid_data(locations: list) -> list:
+    """Get Covid data for several locations at once.
+
+    Keyword arguements:
+        locations -- list of (location, location_type) pairs
+
+    Return values:
+        covid_dict_data -- list of the data for each location, in the same
+        order, with None for any request that failed
+    """
+    incremental = get_config().get('incremental_updates', True)
+
+    def request(location: tuple) -> dict or None:
+        try:
+            return covid_API_request(
+                location[0], location[1], incremental=incremental
+                )
+        except Exception as error:
+            logger.log_error(
+                'Covid API request failed for '+str(location[0])+': '+
+                str(error)
+                )
+            return None
+
+    # Make every request at the same time
+    logger.log_infomation('Getting covid data for '+str(len(locations))+
+        ' locations')
+    max_workers = min(
+        len(locations), get_config().get('max_fetch_workers', 8)
+        ) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(request, locations))
+
+def fetch_area_infections(locations: list) -> list:
+    """Get the 7 day infections of many areas using batched requests.
+
+    Keyword arguements:
+        locations -- list of dictionaries with location and location_type
+
+    Return values:
+        areas -- list of dictionaries with location and
+        local_7day_infections, in the order of locations
+    """
+    return _area_infections(
+        locations, fetch_covid_data(_area_requests(locations))
+        )
+
+def _area_requests(locations: list) -> list:
+    """Group areas into batched (location, location_type) requests.
+
+    A batch gets every area of a type, so a location type is only batched
+    when it has at least batch_threshold of the locations and they are at
+    least batch_fraction of the areas of that type. The rest are requested
+    on their own, at the same time. Once stored, a batch only fetches the
+    newest days of every area (see covid_API_delta_request).
+    """
+    names_by_type = {}
+    for area in locations:
+        names_by_type.setdefault(area['location_type'], []).append(
+            area['location']
+            )
+    area_requests = []
+    for location_type, names in names_by_type.items():
+        if len(names) >= get_config().get('batch_threshold', 10) and (
+            len(names) >= get_config().get('batch_fraction', 0.5) *
+            (_area_count(location_type) or float('inf'))
+            ):
+            area_requests.append((None, location_type))
+        else:
+            area_requests.extend((name, location_type) for name in names)
+    return area_requests
+
+def _area_count(location_type: str) -> int:
+    """Get the number of areas of a type (0 if it can't be got).
+
+    Only the newest day of each area is asked for, the first time.
+    """
+    if location_type not in _area_counts:
+        try:
+            json_data = get_covid_api()(
+                filters=['areaType='+location_type],
+                structure={'areaName':'areaName'},
+                latest_by=aggregates.DEFAULT_METRIC
+                ).get_json()
+        except Exception as error:
+            logger.log_error('Covid API area count failed: '+str(error))
+            return 0
+        _area_counts[location_type] = len(
+            (json_data or {}).get('data') or []
+            )
+    return _area_counts[location_type]
+
+def _area_infections(locations: list, responses: list) -> list:
+    """Get the 7 day infections of the locations from API responses."""
+    for covid_dict_data in responses:
+        if covid_dict_data:
+            aggregates.add_api_data(covid_dict_data)
+    areas = []
+    for area in locations:
+        figures = aggregates.get_aggregates(
+            area['location_type'], area['location']
+            )
+        if figures:
+            areas.append({
+                'location':area['location'],
+                'local_7day_infections':figures['sum']
+                })
+    return areas
 
 def update_covid_data() -> None:
     """Update the Covid-19 data."""
-    global covid_data
-
     # Get local and national covid data.
     logger.log_infomation('Updating covid data')
-    location, local_7day_infections = (
-        process_covid_local_dict_data(covid_API_request())
-    )
-    nation, national_7day_infactions, hospital_cases, deaths_total = (
-        process_covid_country_dict_data(
-            covid_API_request(location="England", location_type='nation')
-            )
-    )
-    # Combine the covid data.
+    locations = get_config().get('locations', [])
+    local_data, national_data, *area_data = fetch_covid_data([
+        (get_config()['location'], get_config()['location_type']),
+        ('England', 'nation'),
+        *_area_requests(locations)
+        ])
+    if not (local_data and national_data):
+        logger.log_warning('Covid data not updated')
+        return
+    set_covid_data(
+        local_data, national_data, _area_infections(locations, area_data)
+        )
+
+def load_stored_covid_data() -> bool:
+    """Get the Covid-19 data from the store rather than the API.
+
+    Return values:
+        loaded -- whether stored data was found for both locations
+    """
+    logger.log_infomation('Loading stored covid data')
+    local_data = covid_store.to_api_data(
+        get_config()['location_type'], get_config()['location']
+        )
+    national_data = covid_store.to_api_data('nation', 'England')
+    if not (local_data and national_data):
+        logger.log_warning('No stored covid data')
+        return False
+
+    # Get the other areas that have been stored
+    locations = get_config().get('locations', [])
+    set_covid_data(local_data, national_data, _area_infections(
+        locations,
+        [
+            covid_store.to_api_data(area['location_type'], area['location'])
+            for area in locations
+            ]
+        ))
+    return True
+
+@metrics.timed('set_covid_data')
+def set_covid_data(
+    local_data: dict,
+    national_data: dict,
+    areas: list = None
+    ) -> None:
+    """Set the Covid-19 data from local and national API data.
+
+    Keyword arguements:
+        local_data -- local covid data,
+        national_data -- national covid data
+
+    Optional arguements:
+        areas -- 7 day infections of other areas from fetch_area_infections
+    """
+    global covid_snapshot
+
+    # Add the new days to the rolling figures, then read them
+    aggregates.add_api_data(local_data)
+    aggregates.add_api_data(national_data)
+    local_row = local_data['data'][0]
+    national_row = national_data['data'][0]
+    location = local_row['areaName']
+    nation = national_row['areaName']
+    local_figures = aggregates.get_aggregates(
+        local_row['areaType'], location
+        ) or {}
+    national_figures = aggregates.get_aggregates(
+        national_row['areaType'], nation
+        ) or {}
+    hospital_figures = aggregates.get_aggregates(
+        national_row['areaType'], nation, 'hospitalCases'
+        ) or {}
+    deaths_figures = aggregates.get_aggregates(
+        national_row['areaType'], nation, 'cumDailyNsoDeathsByDeathDate'
+        ) or {}
+    local_7day_infections = local_figures.get('sum', 0)
+    national_7day_infactions = national_figures.get('sum', 0)
+    hospital_cases = hospital_figures.get('latest', 0)
+    deaths_total = deaths_figures.get('latest', 0)
+
+    # Combine the covid data, and publish it in one step.
     covid_data =  {
         'location':location,
         'local_7day_infections':local_7day_infections,
         'nation':nation,
         'national_7day_infections':national_7day_infactions,
         'hospital_cases':hospital_cases,
-        'deaths':deaths_total
+        'deaths':deaths_total,
+        'areas':tuple(areas or ()),
+        'local_figures':local_figures,
+        'national_figures':national_figures,
+        'local_metrics':query_plan.run_rows(
+            query_plan.get_plan(), local_data['data']
+            ),
+        'national_metrics':query_plan.run_rows(
+            query_plan.get_plan(), national_data['data']
+            )
         }
+    covid_snapshot = (covid_snapshot[0]+1, covid_data)
 
 def process_covid_local_dict_data(
     covid_dict_data: dict
@@ -273,30 +800,19 @@ def process_covid_country_dict_data(
 
 def get_updates() -> list:
     """Get the list of updates."""
-    return updates
+    return list_scheduled_updates(updates)
 
-def schedule_check_data() -> dict or bool:
-    """Runs the schedular.
-
-    Return values:
-        done -- completed update or False
-    """
-    # Run schedular
-    logger.log_infomation('Data schedular running')
-    schedule_queue_length = len(schedule.queue)
-    schedule.run(blocking=False)
-
-    # Get completed update if an update occured.
-    done = False
-    if len(schedule.queue) < schedule_queue_length:
-        done = updates.pop(0)
-        return done
+def get_covid_data() -> dict:
+    """Get the covid data (which must not be changed)."""
+    return covid_snapshot[1]
 
-    return done
+def get_covid_snapshot() -> tuple[int, dict]:
+    """Get the version and covid data, published together."""
+    return covid_snapshot
 
-def get_covid_data() -> dict:
-    """Get the covid data."""
-    return covid_data
+def get_version() -> tuple[int, int]:
+    """Get a version that changes whenever the covid data or updates do."""
+    return covid_snapshot[0], updates['version']
 
 def remove_data_update(name: str) -> bool:
     """Remove a data update from the list of updates.
@@ -323,7 +839,4 @@ def set_repeating_data_update(update_name: str) -> None:
     logger.log_infomation('Set update to be repeating')
 
     # Find update, and set to be repeating
-    for update in updates:
-        if update['title'] == update_name:
-            update['repeat'] = True
-            break
+    set_scheduled_repeat(update_name, updates)
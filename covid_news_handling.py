@@ -1,53 +1,94 @@
 """Covid news handing module
 
 Functions:
+    get_news_client -- gets the News API client
     news_API_request -- makes API request to News API
+    article_key -- gets the identity of an article
     update_news -- gets updated news headlines
     remove_headline -- removes news headline
     schedule_news_update -- schedules updates
     get_updates -- gets uncompleted updates
-    schedule_check_news -- runs scheduler
+    run_news_update -- runs a scheduled update
     get_news -- gets formatted news data
+    get_news_snapshot -- gets the headlines with their version
+    get_version -- gets the version of the headlines and updates
     remove_news_update -- removes future news update
     set_repeating_news_update -- makes an update repeat
 """
-import json
-import sched
+import hashlib
+import threading
 import time
-
-from newsapi import NewsApiClient
+from typing import NamedTuple
 
 import logger
-from shared_functions import remove_scheduled_update, time_format
-
-# Load config file
-with open("config.json", 'r', encoding='utf8') as config_file:
-    configerables = json.load(config_file)
-
-newsapi = NewsApiClient(api_key=configerables["api_key"])
+import metrics
+import response_cache
+import scheduler
+from shared_functions import (
+    add_scheduled_update,
+    complete_scheduled_update,
+    is_scheduled,
+    list_scheduled_updates,
+    get_config,
+    new_update_registry,
+    remove_scheduled_update,
+    set_scheduled_event,
+    set_scheduled_repeat,
+    time_format
+    )
 
-headlines = []
-deleted_headlines = []
-updates = []
-schedule = sched.scheduler(time.time, time.sleep)
+# News API client, made on first use
+_newsapi = None
+
+class Headline(NamedTuple):
+    """A news headline shown on the page."""
+    title: str
+    content: str
+    url: str
+
+# Headlines keyed by article identity (oldest first), the identities of
+# each title (oldest first), and the hashes of deleted article identities
+# (oldest first), only changed with the lock
+headlines = {}
+headline_titles = {}
+deleted_headlines = {}
+headlines_lock = threading.Lock()
+# Version and headlines, published together and never changed after
+headlines_snapshot = (0, ())
+updates = new_update_registry()
+
+def get_news_client() -> any:
+    """Get the News API client, making it the first time."""
+    global _newsapi
+    if _newsapi is None:
+        from newsapi import NewsApiClient, const
+        const.EVERYTHING_URL = get_config().get(
+            'news_api_endpoint', const.EVERYTHING_URL
+            )
+        _newsapi = NewsApiClient(api_key=get_config()["api_key"])
+    return _newsapi
 
 def news_API_request(
-    covid_terms: str = configerables['news_search_terms']
+    covid_terms: str = None
     ) -> list:
     """Get headlines about Covid in English.
 
     Optional arguements:
-        covid_terms -- search terms for the API request
+        covid_terms -- search terms for the API request (the config
+        file's news_search_terms by default)
 
     Return values:
         news_articles -- list of the articles
     """
+    if covid_terms is None:
+        covid_terms = get_config()['news_search_terms']
     logger.log_infomation('Fetching new news articles')
 
     # Get covid news articles
-    news_stories = newsapi.get_everything(
-        q=covid_terms,
-        language=configerables['language']
+    news_stories = response_cache.cached_request(
+        'news',
+        (covid_terms, get_config()['language']),
+        lambda: _news_API_fetch(covid_terms)
     )
 
     if not news_stories:
@@ -57,25 +98,61 @@ def news_API_request(
 
     return news_articles
 
+@metrics.timed('news_API_request')
+def _news_API_fetch(covid_terms: str) -> dict:
+    """Get headlines from News API, bypassing the response cache."""
+    return get_news_client().get_everything(
+        q=covid_terms,
+        language=get_config()['language']
+    )
+
+def article_key(article: dict) -> str:
+    """Get the identity of an article.
+
+    Keyword arguements:
+        article -- news article
+
+    Return values:
+        key -- the url of the article, or a hash of its text without one
+    """
+    if article.get('url'):
+        return article['url']
+    text = str(article.get('title'))+'\n'+str(article.get('content'))
+    return hashlib.sha1(text.encode('utf8')).hexdigest()
+
+def _tombstone(key: str) -> int:
+    """Get the compact hash kept for a deleted article."""
+    return int.from_bytes(
+        hashlib.blake2b(key.encode('utf8'), digest_size=8).digest(), 'big'
+        )
+
+@metrics.timed('update_news')
 def update_news() -> None:
     """Update the covid news headlines."""
     logger.log_infomation('Getting new news articles')
 
     news_articles = news_API_request()
 
-    # Format articles and add to headlines if user hasn't deleted it
-    for article in news_articles:
-        temp_dictionary = {}
-        temp_dictionary['title'] = article['title']
-        temp_dictionary['content'] = article['content']
-        temp_dictionary['url'] = article['url']
-
-        if (temp_dictionary not in headlines) and (
-            temp_dictionary not in deleted_headlines
-            ):
-            headlines.append(temp_dictionary)
-        else:
-            logger.log_warning('Headline already seen')
+    with headlines_lock:
+        # Format articles and add to headlines if user hasn't deleted it
+        for article in news_articles:
+            key = article_key(article)
+            if (key not in headlines) and (
+                _tombstone(key) not in deleted_headlines
+                ):
+                headlines[key] = Headline(
+                    article['title'], article['content'], article['url']
+                    )
+                headline_titles.setdefault(article['title'], []).append(key)
+            else:
+                logger.log_warning('Headline already seen')
+
+        # Remove the oldest headlines when over capacity
+        max_headlines = get_config().get('max_headlines', 100)
+        while len(headlines) > max_headlines:
+            key = next(iter(headlines))
+            _forget_title(headlines.pop(key).title, key)
+        _publish_headlines()
 
 def remove_headline(headline: str) -> None:
     """Remove the selected headline.
@@ -84,15 +161,34 @@ def remove_headline(headline: str) -> None:
         headline -- title of the headline to replace
     """
     logger.log_infomation('Remvoing headline')
-    # Get the whole headline from the title
-    headline = next(
-        (item for item in headlines if item['title'] == headline),
-        None
-        )
-    # Remove the headline
-    if headline in headlines:
-        headlines.remove(headline)
-        deleted_headlines.append(headline)
+    with headlines_lock:
+        # Get the oldest headline with the title and remove it
+        keys = headline_titles.get(headline)
+        if keys:
+            key = keys[0]
+            _forget_title(headline, key)
+            del headlines[key]
+            deleted_headlines[_tombstone(key)] = None
+
+            # Forget the oldest deletions when over capacity
+            max_deleted = get_config().get('max_deleted_headlines', 1000)
+            while len(deleted_headlines) > max_deleted:
+                del deleted_headlines[next(iter(deleted_headlines))]
+            _publish_headlines()
+
+def _forget_title(title: str, key: str) -> None:
+    """Remove an identity from the titles index (the lock must be held)."""
+    keys = headline_titles[title]
+    keys.remove(key)
+    if not keys:
+        del headline_titles[title]
+
+def _publish_headlines() -> None:
+    """Publish the headlines as a new snapshot (the lock must be held)."""
+    global headlines_snapshot
+    headlines_current = tuple(headlines.values())
+    if headlines_current != headlines_snapshot[1]:
+        headlines_snapshot = (headlines_snapshot[0]+1, headlines_current)
 
 def schedule_news_update(
     update_interval: str,
@@ -104,7 +200,6 @@ def schedule_news_update(
         update_interval -- time of day update takes place,
         update_name -- name of the update
     """
-    global updates
     logger.log_infomation('Scheduling new news update')
 
     # Format update_interval
@@ -120,56 +215,64 @@ def schedule_news_update(
     update = {
         'title':update_name,
         'content':readable_schedule_time,
-        'schedule':schedule,
         'time':schedule_time,
         'interval':update_interval,
         'repeat':False,
         'type':'news'
         }
 
-    # Add update to updates list if it is not a repeat
-    repeat = False
-    for current_update in updates:
-        if update['time'] == current_update['time']:
-            repeat = True
-    if not repeat:
-        schedule.enter(schedule_time-current_time_s, 1, update_news)
-        updates.append(update)
-        updates = sorted(updates, key=lambda x:x['time'])
+    # Add update to updates if it's not a repeat.
+    if add_scheduled_update(update, updates):
+        set_scheduled_event(update, scheduler.enter(
+            schedule_time-current_time_s, run_news_update, (update,)
+            ), updates)
+    else:
+        logger.log_warning(
+            'News update already at specified time or with that name'
+            )
 
-def get_updates() -> list:
-    """Get the list of updates.
+def run_news_update(update: dict) -> None:
+    """Run a scheduled news update, then repeat it or mark it completed.
 
-    Return values:
-        updates -- list of future updates
+    Keyword arguements:
+        update -- the scheduled update
     """
-    return updates
+    # Skip updates that have been removed
+    if not is_scheduled(update, updates):
+        return
+
+    try:
+        update_news()
+    finally:
+        # Remove update from updates, and schedule it again if needed
+        complete_scheduled_update(update, updates)
+        if update['repeat']:
+            schedule_news_update(update['interval'], update['title'])
+            set_repeating_news_update(update['title'])
 
-def schedule_check_news() -> dict or bool:
-    """Run the schedular.
+def get_updates() -> list:
+    """Get the list of updates.
 
     Return values:
-        new -- completed update or False
+        updates -- list of future updates
     """
-    # Run the schedular
-    logger.log_infomation('Running news schedular')
-    schedule_queue_length = len(schedule.queue)
-    schedule.run(blocking=False)
-
-    # If an update occured, get it
-    new = False
-    if len(schedule.queue) < schedule_queue_length:
-        new = updates.pop(0)
-        return new
-    return new
+    return list_scheduled_updates(updates)
 
 def get_news() -> list:
     """Return a list of headlines.
 
     Return values:
-        headlines -- list of current headlines
+        headlines -- list of current Headline records, oldest first
     """
-    return headlines
+    return list(headlines_snapshot[1])
+
+def get_news_snapshot() -> tuple[int, tuple]:
+    """Get the version and headlines, published together."""
+    return headlines_snapshot
+
+def get_version() -> tuple[int, int]:
+    """Get a version that changes whenever the headlines or updates do."""
+    return headlines_snapshot[0], updates['version']
 
 def remove_news_update(name: str) -> bool:
     """Remove a news update from list of updates.
@@ -195,8 +298,5 @@ def set_repeating_news_update(update_name: str) -> None:
     """
     logger.log_infomation('Setting repeating news update')
 
-    # Set update to be repeating
-    for update in updates:
-        if update['title'] == update_name:
-            update['repeat'] = True
-            break
+    # Find update, and set to be repeating
+    set_scheduled_repeat(update_name, updates)
@@ -0,0 +1,387 @@
+"""Covid data store module.
+
+Keeps every fetched Covid time series on disk as a memory-mapped array of
+daily values, keyed by (areaType, areaName, metric), so ranges of days can
+be read without fetching or parsing the data again.
+
+Functions:
+    save_series -- saves a daily time series
+    load_series -- gets a saved time series
+    get_range -- gets the values of a saved series between two dates
+    latest_date -- gets the last date held for an area
+    area_names -- gets the names of the stored areas of a type
+    store_api_data -- saves the series from a Cov19API response
+    store_areas -- saves the series of many areas
+    store_csv_columns -- saves the series from csv data columns
+    to_api_data -- rebuilds a Cov19API style response from the store
+"""
+import datetime
+import json
+import mmap
+import os
+import threading
+from array import array
+from urllib.parse import quote
+
+import logger
+from shared_functions import get_config
+
+# Value saved for days without data
+MISSING = -2**63
+# Fields of a data row that describe the area rather than a metric
+AREA_FIELDS = ('areaCode', 'areaName', 'areaType', 'date')
+
+# Folder of the store, from the config file unless set
+store_directory = None
+_index = None
+_maps = {}
+_lock = threading.Lock()
+
+def _series_key(area_type: str, area_name: str, metric: str = '') -> str:
+    """Get the index key of a series (or of an area without a metric)."""
+    return '|'.join(filter(None, (area_type, area_name, metric)))
+
+def _directory() -> str:
+    """Get the folder of the store."""
+    return store_directory or get_config().get(
+        'store_directory', 'covid_store'
+        )
+
+def _get_index() -> dict:
+    """Get the store index, loading it from disk the first time."""
+    global _index
+    if _index is None:
+        try:
+            with open(
+                os.path.join(_directory(), 'index.json'),
+                'r', encoding='utf8'
+                ) as index_file:
+                _index = json.load(index_file)
+        except FileNotFoundError:
+            _index = {'series': {}, 'areas': {}}
+    return _index
+
+def _write_index() -> None:
+    """Write the store index to disk (the lock must be held)."""
+    _write_file('index.json', json.dumps(_get_index()).encode('utf8'))
+
+def _write_file(filename: str, content: bytes) -> None:
+    """Replace a file in the store in one step."""
+    os.makedirs(_directory(), exist_ok=True)
+    path = os.path.join(_directory(), filename)
+    with open(path+'.tmp', 'wb') as store_file:
+        store_file.write(content)
+    os.replace(path+'.tmp', path)
+
+def save_series(
+    area_type: str,
+    area_name: str,
+    metric: str,
+    values_by_date: dict,
+    write_index: bool = True
+    ) -> None:
+    """Save a daily time series, replacing any saved copy.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area,
+        metric -- name of the metric,
+        values_by_date -- dictionary of "YYYY-MM-DD" to value (or None)
+
+    Optional arguements:
+        write_index -- write the index now, rather than after a batch
+    """
+    key = _series_key(area_type, area_name, metric)
+    if not values_by_date:
+        logger.log_warning('No values to store for '+key)
+        return
+
+    # Lay the values out as one slot for every day
+    days = {
+        datetime.date.fromisoformat(date).toordinal(): value
+        for date, value in values_by_date.items()
+        }
+    first_day = min(days)
+    values = array('q', [MISSING]) * (max(days)-first_day+1)
+    for day, value in days.items():
+        if value is not None:
+            values[day-first_day] = int(value)
+
+    # Write the values then the index
+    logger.log_infomation('Storing covid series '+key)
+    filename = '__'.join(
+        quote(part, safe='') for part in (area_type, area_name, metric)
+        ) + '.bin'
+    with _lock:
+        index = _get_index()
+        _write_file(filename, values.tobytes())
+        index['series'][key] = {
+            'file':filename,
+            'start':datetime.date.fromordinal(first_day).isoformat(),
+            'length':len(values)
+            }
+        if write_index:
+            _write_index()
+        _maps.pop(key, None)
+
+def load_series(
+    area_type: str,
+    area_name: str,
+    metric: str
+    ) -> tuple[str, memoryview] or None:
+    """Get a saved time series without copying it.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area,
+        metric -- name of the metric
+
+    Return values:
+        start -- date of the first value ("YYYY-MM-DD"),
+        values -- memoryview of the daily values (MISSING for no data)
+        or None if the series isn't saved
+    """
+    key = _series_key(area_type, area_name, metric)
+    with _lock:
+        entry = _get_index()['series'].get(key)
+        if not entry:
+            return None
+        if key not in _maps:
+            path = os.path.join(_directory(), entry['file'])
+            with open(path, 'rb') as store_file:
+                if os.fstat(store_file.fileno()).st_size:
+                    view = memoryview(mmap.mmap(
+                        store_file.fileno(), 0, access=mmap.ACCESS_READ
+                        )).cast('q')
+                else:
+                    view = memoryview(array('q'))
+            _maps[key] = (entry['start'], view)
+        return _maps[key]
+
+def get_range(
+    area_type: str,
+    area_name: str,
+    metric: str,
+    first_date: str,
+    last_date: str
+    ) -> memoryview:
+    """Get the saved values from first_date to last_date (inclusive).
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area,
+        metric -- name of the metric,
+        first_date -- first date in the range ("YYYY-MM-DD"),
+        last_date -- last date in the range ("YYYY-MM-DD")
+
+    Return values:
+        values -- memoryview of the daily values, oldest first
+    """
+    series = load_series(area_type, area_name, metric)
+    if not series:
+        return memoryview(array('q'))
+    start, values = series
+    start_day = datetime.date.fromisoformat(start).toordinal()
+    first = datetime.date.fromisoformat(first_date).toordinal()-start_day
+    last = datetime.date.fromisoformat(last_date).toordinal()-start_day
+    return values[max(first, 0):max(last+1, 0)]
+
+def latest_date(
+    area_type: str,
+    area_name: str,
+    metric: str = ''
+    ) -> str or None:
+    """Get the last date held for an area or one of its metrics.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area
+
+    Optional arguements:
+        metric -- name of the metric (any metric by default)
+
+    Return values:
+        date -- last date held ("YYYY-MM-DD") or None
+    """
+    prefix = _series_key(area_type, area_name, metric)
+    latest = None
+    with _lock:
+        for key, entry in _get_index()['series'].items():
+            if key == prefix or (not metric and key.startswith(prefix+'|')):
+                day = datetime.date.fromisoformat(
+                    entry['start']
+                    ).toordinal() + entry['length'] - 1
+                latest = max(latest or day, day)
+    if latest is None:
+        return None
+    return datetime.date.fromordinal(latest).isoformat()
+
+def area_names(area_type: str) -> list:
+    """Get the names of the stored areas of a type.
+
+    Keyword arguements:
+        area_type -- type of the areas
+
+    Return values:
+        names -- list of area names
+    """
+    prefix = area_type+'|'
+    with _lock:
+        return [
+            key[len(prefix):] for key in _get_index()['areas']
+            if key.startswith(prefix)
+            ]
+
+def _save_area(area_type: str, area_name: str, area_code: str) -> None:
+    """Record the code of an area in the index (written with the series)."""
+    with _lock:
+        _get_index()['areas'][_series_key(area_type, area_name)] = area_code
+
+def store_api_data(covid_dict_data: dict, merge: bool = False) -> None:
+    """Save every series in a Cov19API json response.
+
+    Keyword arguements:
+        covid_dict_data -- Covid data from covid_API_request
+
+    Optional arguements:
+        merge -- add the days to the saved series instead of replacing them
+    """
+    # Group the rows by area, then by metric
+    areas = {}
+    for row in covid_dict_data.get('data') or []:
+        area = (row['areaType'], row['areaName'])
+        if area not in areas:
+            areas[area] = (row.get('areaCode'), {})
+        metrics = areas[area][1]
+        for metric, value in row.items():
+            if metric not in AREA_FIELDS:
+                metrics.setdefault(metric, {})[row['date']] = value
+
+    store_areas(areas, merge)
+
+def store_areas(
+    areas: dict,
+    merge: bool = False,
+    older: dict = None
+    ) -> None:
+    """Save the series of many areas, writing the index once.
+
+    Keyword arguements:
+        areas -- dictionary of (area type, area name) to (area code,
+        dictionary of metric to dictionary of "YYYY-MM-DD" to value)
+
+    Optional arguements:
+        merge -- add the days to the saved series instead of replacing them,
+        older -- series like areas from older data, only saved on days
+        without a saved or new value (when merging)
+    """
+    older = older or {}
+    for area in {**older, **areas}:
+        area_type, area_name = area
+        area_code, metrics = areas.get(area) or (older[area][0], {})
+        older_metrics = older.get(area, (None, {}))[1]
+        _save_area(area_type, area_name, area_code)
+        for metric in {**older_metrics, **metrics}:
+            values_by_date = metrics.get(metric, {})
+            if merge:
+                merged = _series_dates(area_type, area_name, metric)
+                for date, value in older_metrics.get(metric, {}).items():
+                    if merged.get(date) is None:
+                        merged[date] = value
+                merged.update(values_by_date)
+                values_by_date = merged
+            save_series(
+                area_type, area_name, metric, values_by_date,
+                write_index=False
+                )
+    with _lock:
+        _write_index()
+
+def _series_dates(area_type: str, area_name: str, metric: str) -> dict:
+    """Get a saved series as a dictionary of date to value."""
+    series = load_series(area_type, area_name, metric)
+    if not series:
+        return {}
+    start, values = series
+    start_day = datetime.date.fromisoformat(start).toordinal()
+    return {
+        datetime.date.fromordinal(start_day+offset).isoformat():
+            None if value == MISSING else value
+        for offset, value in enumerate(values)
+        }
+
+def store_csv_columns(covid_csv_columns: dict) -> None:
+    """Save every series in Covid csv data columns.
+
+    Keyword arguements:
+        covid_csv_columns -- columns from covid_data_handler.csv_columns
+    """
+    names = covid_csv_columns['areaName'][0]
+    types = covid_csv_columns['areaType'][0]
+    codes = covid_csv_columns['areaCode'][0]
+    dates = covid_csv_columns['date'][0]
+
+    # Find the rows of each area
+    areas = {}
+    for row, area in enumerate(zip(types, names)):
+        if area not in areas:
+            areas[area] = (codes[row], [])
+        areas[area][1].append(row)
+
+    for (area_type, area_name), (area_code, rows) in areas.items():
+        _save_area(area_type, area_name, area_code)
+        for metric, (values, mask) in covid_csv_columns.items():
+            if metric not in AREA_FIELDS:
+                save_series(area_type, area_name, metric, {
+                    dates[row]: values[row] if mask[row] else None
+                    for row in rows
+                    }, write_index=False)
+    with _lock:
+        _write_index()
+
+def to_api_data(area_type: str, area_name: str) -> dict or None:
+    """Rebuild a Cov19API style response for an area from the store.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area
+
+    Return values:
+        covid_dict_data -- Covid data with the newest row first, or None
+        if nothing is stored for the area
+    """
+    prefix = _series_key(area_type, area_name)+'|'
+    with _lock:
+        index = _get_index()
+        metrics = [
+            key[len(prefix):] for key in index['series']
+            if key.startswith(prefix)
+            ]
+        area_code = index['areas'].get(_series_key(area_type, area_name))
+    if not metrics:
+        return None
+
+    # Build one row for every day, newest first
+    series = {}
+    for metric in metrics:
+        start, values = load_series(area_type, area_name, metric)
+        series[metric] = (
+            datetime.date.fromisoformat(start).toordinal(), values
+            )
+    first_day = min(start for start, _values in series.values())
+    last_day = max(start+len(values)-1 for start, values in series.values())
+    data = []
+    for day in range(last_day, first_day-1, -1):
+        row = {
+            'areaCode':area_code,
+            'areaName':area_name,
+            'areaType':area_type,
+            'date':datetime.date.fromordinal(day).isoformat()
+            }
+        for metric, (start, values) in series.items():
+            offset = day-start
+            value = values[offset] if 0 <= offset < len(values) else MISSING
+            row[metric] = None if value == MISSING else value
+        data.append(row)
+
+    return {'data':data, 'length':len(data)}
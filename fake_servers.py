@@ -0,0 +1,264 @@
+"""Fake servers module
+
+Local stand-ins for the UK coronavirus API (/v1/data) and the News API
+(/v2/everything), for load and latency testing without a network. Both
+make up their data, and can be slowed down or made to fail some of the
+time. Point the dashboard at them with covid_api_endpoint and
+news_api_endpoint in the config file.
+
+Run this module to start both servers:
+    python fake_servers.py
+
+Functions:
+    covid_rows -- makes up Covid data rows for an area
+    news_articles -- makes up news articles
+    start -- starts the fake servers in the background
+    stop -- stops fake servers
+"""
+import datetime
+import json
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import logger
+from shared_functions import get_config
+
+DEFAULT_SETTINGS = {
+    'host':'127.0.0.1',
+    'covid_port':8001,
+    'news_port':8002,
+    'latency':0.05,
+    'error_rate':0,
+    'days':365,
+    'page_size':1000,
+    'areas':10,
+    'articles':100
+    }
+# Last day of the made up Covid data
+LAST_DATE = datetime.date(2021, 10, 28)
+
+def covid_rows(area_type: str, area_name: str, days: int) -> list:
+    """Make up Covid data rows for an area, newest first.
+
+    Keyword arguements:
+        area_type -- type of the area,
+        area_name -- name of the area,
+        days -- number of days of data
+
+    Return values:
+        rows -- list of rows with every metric the dashboard uses
+    """
+    rng = random.Random(area_type+area_name)
+    area_code = 'E'+str(rng.randrange(10**8)).zfill(8)
+    rows = []
+    deaths = rng.randrange(100_000, 150_000)
+    for day in range(days):
+        rows.append({
+            'areaCode':area_code,
+            'areaName':area_name,
+            'areaType':area_type,
+            'date':(LAST_DATE-datetime.timedelta(days=day)).isoformat(),
+            'cumDailyNsoDeathsByDeathDate':deaths if day >= 14 else None,
+            'hospitalCases':rng.randrange(5_000, 8_000),
+            'newCasesBySpecimenDate':(
+                rng.randrange(20_000, 50_000) if day else None
+                )
+            })
+        deaths -= rng.randrange(0, 100)
+    return rows
+
+def news_articles(terms: str, count: int) -> list:
+    """Make up news articles.
+
+    Keyword arguements:
+        terms -- search terms of the request,
+        count -- number of articles
+
+    Return values:
+        articles -- list of articles like the News API's
+    """
+    return [
+        {
+            'source':{'id':None, 'name':'Fake News'},
+            'title':terms.title()+' headline '+str(article),
+            'description':'Description '+str(article),
+            'content':'Content of article '+str(article),
+            'url':'http://fake.test/news/'+str(article),
+            'publishedAt':LAST_DATE.isoformat()+'T00:00:00Z'
+            }
+        for article in range(count)
+        ]
+
+def _handler(settings: dict, respond: callable) -> type:
+    """Make a request handler that answers with respond(path, query)."""
+    class Handler(BaseHTTPRequestHandler):
+        """Answers requests after the latency, failing at the error rate."""
+        def do_GET(self):
+            self._answer(send_body=True)
+
+        def do_HEAD(self):
+            self._answer(send_body=False)
+
+        def _answer(self, send_body: bool):
+            time.sleep(settings['latency'])
+            url = urlparse(self.path)
+            query = {
+                name: values[0]
+                for name, values in parse_qs(url.query).items()
+                }
+            if random.random() < settings['error_rate']:
+                status, body = 500, {
+                    'status':'error',
+                    'code':'unexpectedError',
+                    'message':'Injected error'
+                    }
+            else:
+                status, body = respond(url.path, query)
+            content = b''
+            if body is not None:
+                content = json.dumps(body).encode('utf8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header(
+                'Last-Modified', formatdate(time.time(), usegmt=True)
+                )
+            self.end_headers()
+            if send_body:
+                self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            logger.log_infomation('Fake server: '+format % args)
+
+    return Handler
+
+def _covid_response(settings: dict) -> callable:
+    """Make the responder of the fake UK coronavirus API."""
+    def respond(path: str, query: dict) -> tuple[int, dict]:
+        if path != '/v1/data':
+            return 404, {'message':'Not found'}
+        filters = dict(
+            item.split('=', 1)
+            for item in query.get('filters', '').split(';') if '=' in item
+            )
+        if 'areaType' not in filters:
+            return 400, {'message':'Missing areaType filter'}
+
+        # Make up the rows of the areas asked for
+        area_names = [filters['areaName']] if 'areaName' in filters else [
+            'Area '+str(area) for area in range(settings['areas'])
+            ]
+        rows = []
+        for area_name in area_names:
+            rows.extend(covid_rows(
+                filters['areaType'], area_name, settings['days']
+                ))
+        if 'date' in filters:
+            rows = [row for row in rows if row['date'] == filters['date']]
+        if query.get('latestBy'):
+            # Only the newest day with the metric, of every area
+            rows = [
+                row for row in rows if row.get(query['latestBy']) is not None
+                ]
+            latest = max((row['date'] for row in rows), default=None)
+            rows = [row for row in rows if row['date'] == latest]
+
+        # Only send the metrics in the structure, a page at a time
+        structure = json.loads(query.get('structure', '{}'))
+        if rows and not structure:
+            structure = {name: name for name in rows[0]}
+        page = int(query.get('page', 1))
+        page_rows = rows[
+            (page-1)*settings['page_size']:page*settings['page_size']
+            ]
+        if not page_rows:
+            return 204, None
+        return 200, {
+            'length':len(page_rows),
+            'maxPageLimit':settings['page_size'],
+            'totalRecords':len(rows),
+            'data':[
+                {name: row.get(metric) for name, metric in structure.items()}
+                for row in page_rows
+                ],
+            'requestPayload':{'page':page, 'filters':filters}
+            }
+    return respond
+
+def _news_response(settings: dict) -> callable:
+    """Make the responder of the fake News API."""
+    def respond(path: str, query: dict) -> tuple[int, dict]:
+        if path != '/v2/everything':
+            return 404, {
+                'status':'error', 'code':'notFound', 'message':'Not found'
+                }
+        articles = news_articles(query.get('q', ''), settings['articles'])
+        page_size = int(query.get('pageSize', 100))
+        page = int(query.get('page', 1))
+        return 200, {
+            'status':'ok',
+            'totalResults':len(articles),
+            'articles':articles[(page-1)*page_size:page*page_size]
+            }
+    return respond
+
+def start(settings: dict = None) -> list:
+    """Start the fake Covid and news servers on background threads.
+
+    Optional arguements:
+        settings -- settings to use instead of those in the config file
+        (a port of 0 picks a free port)
+
+    Return values:
+        servers -- the Covid and news servers (server_address has the
+        host and port of each)
+    """
+    settings = {
+        **DEFAULT_SETTINGS,
+        **get_config().get('fake_servers', {}),
+        **(settings or {})
+        }
+    servers = []
+    for port, respond in (
+        (settings['covid_port'], _covid_response(settings)),
+        (settings['news_port'], _news_response(settings))
+        ):
+        server = ThreadingHTTPServer(
+            (settings['host'], port), _handler(settings, respond)
+            )
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name='fake server', daemon=True
+            ).start()
+        servers.append(server)
+    logger.log_infomation('Started fake servers')
+    return servers
+
+def stop(servers: list) -> None:
+    """Stop fake servers.
+
+    Keyword arguements:
+        servers -- servers from start
+    """
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    covid_server, news_server = start()
+    print(
+        'Set "covid_api_endpoint":"http://'+
+        covid_server.server_address[0]+':'+
+        str(covid_server.server_address[1])+'/v1/data" and '
+        '"news_api_endpoint":"http://'+news_server.server_address[0]+':'+
+        str(news_server.server_address[1])+'/v2/everything" in config.json'
+        )
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop([covid_server, news_server])
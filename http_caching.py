@@ -0,0 +1,151 @@
+"""HTTP caching module.
+
+Helpers for answering repeat page loads cheaply: strong ETags made from
+the content of a body, gzip/brotli compressed bodies, and precompressed
+copies of the files in static/.
+
+Run this module to precompress the static files:
+    python http_caching.py
+
+Functions:
+    make_etag -- makes a strong ETag for a body
+    encodings -- gets the content encodings that can be made
+    compress -- compresses a body
+    precompress_static -- writes compressed copies of static files
+    precompressed_file -- finds a compressed copy of a static file
+"""
+import gzip
+import hashlib
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import logger
+
+# File extension of the compressed copies of each encoding
+EXTENSIONS = {'br':'.br', 'gzip':'.gz'}
+# Files not worth compressing
+SKIPPED_EXTENSIONS = ('.br', '.gz', '.png', '.jpg', '.jpeg', '.gif', '.ico')
+
+def make_etag(body: bytes, encoding: str = 'identity') -> str:
+    """Make a strong ETag from the content of a body.
+
+    As it only depends on the content, the ETag stays right after a
+    restart and is the same in every process.
+
+    Keyword arguements:
+        body -- uncompressed body
+
+    Optional arguements:
+        encoding -- content encoding of the body
+
+    Return values:
+        etag -- ETag value (without quotes)
+    """
+    digest = hashlib.sha1(body).hexdigest()[:16]
+    if encoding == 'identity':
+        return digest
+    return digest+'-'+encoding
+
+def encodings() -> list:
+    """Get the content encodings that can be made, best first."""
+    if brotli is None:
+        return ['gzip', 'identity']
+    return ['br', 'gzip', 'identity']
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body.
+
+    Keyword arguements:
+        body -- uncompressed body,
+        encoding -- 'br', 'gzip' or 'identity'
+
+    Return values:
+        body -- compressed body
+    """
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+def precompress_static(directory: str = 'static') -> int:
+    """Write compressed copies of every file in a folder.
+
+    Copies are only written when missing or older than the file.
+
+    Keyword arguements:
+        directory -- folder of static files
+
+    Return values:
+        written -- number of compressed files written
+    """
+    written = 0
+    for folder, _folders, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.startswith('.') or (
+                filename.lower().endswith(SKIPPED_EXTENSIONS)
+                ):
+                continue
+            path = os.path.join(folder, filename)
+            for encoding in encodings()[:-1]:
+                if not _is_current(path, path+EXTENSIONS[encoding]):
+                    _write_compressed(path, encoding)
+                    written += 1
+    logger.log_infomation('Precompressed '+str(written)+' static files')
+    return written
+
+def _is_current(path: str, compressed_path: str) -> bool:
+    """Check if a compressed copy exists and isn't older than its file."""
+    return os.path.exists(compressed_path) and (
+        os.path.getmtime(compressed_path) >= os.path.getmtime(path)
+        )
+
+def _write_compressed(path: str, encoding: str) -> None:
+    """Write the compressed copy of a file, replacing any in one step."""
+    compressed_path = path+EXTENSIONS[encoding]
+    with open(path, 'rb') as static_file:
+        body = compress(static_file.read(), encoding)
+    with open(compressed_path+'.tmp', 'wb') as compressed_file:
+        compressed_file.write(body)
+    os.replace(compressed_path+'.tmp', compressed_path)
+
+def precompressed_file(
+    directory: str,
+    filename: str,
+    accepted: list
+    ) -> tuple[str, str]:
+    """Find the best compressed copy of a static file.
+
+    Copies older than the file are written again before being used.
+
+    Keyword arguements:
+        directory -- folder of static files,
+        filename -- path of the file in the folder,
+        accepted -- content encodings the client accepts
+
+    Return values:
+        filename -- path of the file to send,
+        encoding -- its content encoding ('identity' if not compressed)
+    """
+    path = os.path.join(directory, filename)
+    if not os.path.isfile(path):
+        return filename, 'identity'
+    for encoding, extension in EXTENSIONS.items():
+        if encoding not in accepted or not os.path.isfile(path+extension):
+            continue
+        if not _is_current(path, path+extension):
+            # Skip copies that can't be made again here
+            if encoding not in encodings():
+                continue
+            logger.log_infomation('Compressing '+filename+' again')
+            _write_compressed(path, encoding)
+        return filename+extension, encoding
+    return filename, 'identity'
+
+if __name__ == '__main__':
+    precompress_static(sys.argv[1] if len(sys.argv) > 1 else 'static')
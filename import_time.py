@@ -0,0 +1,104 @@
+"""Import time module
+
+Measures how long each module takes to import (with python -X importtime)
+and fails if one takes longer than its limit in the config file, or
+imports an API client that should only be imported on first use.
+
+Run this module to check the import times:
+    python import_time.py
+
+Functions:
+    parse_importtime -- gets the import times from -X importtime output
+    measure_import -- measures the import of a module
+    check_import_times -- checks every module against its limit
+"""
+import subprocess
+import sys
+
+from shared_functions import get_config
+
+# Limits (in milliseconds) used when the config file doesn't set one
+DEFAULT_LIMITS = {
+    'logger':50,
+    'shared_functions':50,
+    'scheduler':50,
+    'metrics':50,
+    'response_cache':50,
+    'covid_store':50,
+    'snapshot_store':100,
+    'http_caching':50,
+    'covid_data_handler':100,
+    'covid_news_handling':100
+    }
+# Packages only imported when an API request is made
+DEFERRED_IMPORTS = ('uk_covid19', 'newsapi')
+# Imports measured for each module, the fastest is used
+RUNS = 3
+
+def parse_importtime(output: str) -> dict:
+    """Get the import times from -X importtime output.
+
+    Keyword arguements:
+        output -- the output (stderr) of python -X importtime
+
+    Return values:
+        import_times -- dictionary of every imported module to its
+        cumulative import time in microseconds
+    """
+    import_times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _self_time, cumulative, name = line[12:].split('|')
+        if cumulative.strip().isdigit():
+            import_times[name.strip()] = int(cumulative)
+    return import_times
+
+def measure_import(module: str) -> dict:
+    """Measure the import of a module in a new interpreter.
+
+    Keyword arguements:
+        module -- name of the module
+
+    Return values:
+        import_times -- dictionary of every module it imported to its
+        cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import '+module],
+        capture_output=True,
+        text=True,
+        check=True
+        )
+    return parse_importtime(result.stderr)
+
+def check_import_times() -> list:
+    """Check every module imports within its limit.
+
+    Return values:
+        failures -- list of messages, one for each failed check
+    """
+    limits = {**DEFAULT_LIMITS, **get_config().get('import_time_limits', {})}
+    failures = []
+    for module, limit in limits.items():
+        runs = [measure_import(module) for _ in range(RUNS)]
+        milliseconds = min(run[module] for run in runs)/1000
+        print(
+            module+': '+str(round(milliseconds, 1))+' ms (limit '+
+            str(limit)+' ms)'
+            )
+        if milliseconds > limit:
+            failures.append(
+                module+' took '+str(round(milliseconds, 1))+
+                ' ms to import (limit '+str(limit)+' ms)'
+                )
+        for package in DEFERRED_IMPORTS:
+            if package in runs[0]:
+                failures.append(module+' imports '+package)
+    return failures
+
+if __name__ == '__main__':
+    import_failures = check_import_times()
+    for failure in import_failures:
+        print('FAIL:', failure)
+    sys.exit(1 if import_failures else 0)
@@ -1,28 +1,129 @@
 """Logger module
 
+Messages are put on a queue and written to the log file by a background
+thread, so logging never waits for the file. Logging is set up on the
+first message, from the "logging" settings in the config file. The log
+file is rotated when it gets too big, and a message repeated too often
+in a short time is only logged a few times.
+
 Functions:
     log_infomation -- logs infomation
     log_warning -- logs a warning
     log_error -- logs an error
+    stop -- writes any queued messages and stops the background thread
 """
+import atexit
 import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+DEFAULT_SETTINGS = {
+    'level':'INFO',
+    'file':'app.log',
+    'max_bytes':1048576,
+    'backup_count':3,
+    'repeat_limit':5,
+    'repeat_period':10
+    }
+
+_logger = logging.getLogger()
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_settings = DEFAULT_SETTINGS
+# Messages to when they were first logged in this period and times seen
+_recent = {}
+_recent_lock = threading.Lock()
+
+def _configure() -> None:
+    """Set up logging configeration the first time it is needed."""
+    global _configured, _listener, _queue_handler, _settings
+    with _configure_lock:
+        if _configured:
+            return
+        from shared_functions import get_config
+        _settings = {**DEFAULT_SETTINGS, **get_config().get('logging', {})}
+
+        # Write messages from the queue on a background thread
+        file_handler = RotatingFileHandler(
+            _settings['file'],
+            maxBytes=_settings['max_bytes'],
+            backupCount=_settings['backup_count'],
+            encoding='utf8'
+            )
+        file_handler.setFormatter(logging.Formatter(
+            '%(name)s - %(levelname)s - %(message)s'
+            ))
+        log_queue = queue.SimpleQueue()
+        _queue_handler = QueueHandler(log_queue)
+        _queue_handler.addFilter(_limit_repeats)
+        _logger.addHandler(_queue_handler)
+        _logger.setLevel(_settings['level'])
+        _listener = QueueListener(log_queue, file_handler)
+        _listener.start()
+        _configured = True
+
+def _limit_repeats(record: logging.LogRecord) -> bool:
+    """Drop a message logged more than repeat_limit times in a period.
 
-# Set up logging configeration
-logging.basicConfig(
-    filename='app.log',
-    filemode='w',
-    format='%(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-    )
+    The first message after the period says how many were dropped.
+    """
+    limit = _settings['repeat_limit']
+    period = _settings['repeat_period']
+    key = (record.levelno, record.msg)
+    now = time.monotonic()
+    with _recent_lock:
+        first_logged, seen = _recent.get(key, (now, 0))
+        if now-first_logged >= period:
+            if seen > limit:
+                record.msg = (
+                    str(record.msg)+' ('+str(seen-limit)+
+                    ' repeats not logged)'
+                    )
+            first_logged, seen = now, 0
+        _recent[key] = (first_logged, seen+1)
+
+        # Forget the messages first seen longest ago
+        if len(_recent) > 1000:
+            del _recent[next(iter(_recent))]
+    return seen < limit
+
+def _log(level: int, message: str) -> None:
+    """Queue a message if its level is logged."""
+    if not _configured:
+        _configure()
+    if _logger.isEnabledFor(level):
+        _logger.log(level, message)
 
 def log_infomation(infomation: str) -> None:
     """Log infomation to log file."""
-    logging.info(infomation)
+    _log(logging.INFO, infomation)
 
 def log_warning(warning: str) -> None:
     """Log warning to the log file."""
-    logging.warning(warning)
+    _log(logging.WARNING, warning)
 
 def log_error(error: str) -> None:
     """Log error to the log file."""
-    logging.error(error)
+    _log(logging.ERROR, error)
+
+def stop() -> None:
+    """Write any queued messages and stop the background thread.
+
+    Logging is set up again by the next message.
+    """
+    global _configured, _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        _logger.removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _configured = False
+
+atexit.register(stop)
@@ -1,33 +1,90 @@
 """Main webpage module
 
 Functions:
+    get_role -- gets whether this process fetches data or only reads it
     process_requests -- processes user inputs
+    get_snapshots -- gets snapshots of everything on the page
+    get_version -- gets the version of everything on the page
+    start_background -- starts fetching data in the background
+    initial_update -- fetches the first data
+    create_app -- starts this process's background work and gets the app
+    sync_snapshots -- shares snapshots with reader processes
+    build_view_model -- gets the values shown on the page
     render_page -- renders up-to-date page
+    send_snapshot -- sends a json snapshot of data
+    api_covid -- gets covid data json
+    api_news -- gets news headlines json
+    api_updates -- gets scheduled updates json
+    respond_to_post -- processes a posted user input
+    api_remove_headline -- removes a headline
+    api_add_update -- schedules an update
+    api_remove_update -- removes an update
+    send_metrics -- gets timing metrics
+    send_static -- sends static files
 """
 import json
-from flask import Flask, render_template, request
+import mimetypes
+import threading
+from flask import (
+    Flask,
+    abort,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    send_from_directory
+    )
 from markupsafe import Markup
 
 import covid_data_handler
 import covid_news_handling
+import http_caching
 import logger
+import metrics
+import response_cache
+import scheduler
+import snapshot_store
+from shared_functions import get_config
 
-logger.log_infomation("Updating and fetching initial infomation")
-covid_data_handler.update_covid_data()
-covid_news_handling.update_news()
-covid_data = covid_data_handler.get_covid_data()
-news_articles = covid_news_handling.get_news()
+app = Flask(__name__, static_folder=None)
 
-app = Flask(__name__)
+# Version of the last rendered page, and its body and ETag in each encoding
+page_cache = (None, {}, {})
+# Version, json and ETag of each api snapshot
+api_cache = {}
+# Version and snapshots of this process's data
+local_snapshots = (None, {})
+# Only one user input is processed at a time
+write_lock = threading.Lock()
+# Whether this process fetches and schedules updates, or only reads them
+_role = None
+# Whether create_app has started the background work
+_started = False
 
-# Load config file
-logger.log_infomation("Setting initial updates")
-with open("config.json", 'r', encoding='utf8') as config:
-    configerables = json.load(config)
+# Covid data shown before any has been fetched
+PLACEHOLDER_COVID_DATA = {
+    'location':'',
+    'local_7day_infections':'-',
+    'nation':'',
+    'national_7day_infections':'-',
+    'hospital_cases':'-',
+    'deaths':'-',
+    'areas':[]
+    }
 
-# Set default updates from config file
-if configerables['updates']:
-    for set_update in configerables['updates']:
+def start_background() -> None:
+    """Show saved data and start fetching new data in the background.
+
+    The page is served straight away, from the saved Covid data or the
+    placeholder data, while the first updates run on the scheduler.
+    """
+    logger.log_infomation("Loading saved infomation")
+    covid_data_handler.load_stored_covid_data()
+    scheduler.enter(0, initial_update)
+
+    # Set default updates from config file
+    logger.log_infomation("Setting initial updates")
+    for set_update in get_config()['updates'] or []:
         if (
             (set_update['type'] == 'data') or
             (set_update['type'] == 'both')):
@@ -45,163 +102,402 @@ if configerables['updates']:
                 set_update['time'], set_update['name']
             )
             if set_update['repeat'] == 'True':
-                covid_data_handler.set_repeating_data_update(
+                covid_news_handling.set_repeating_news_update(
                     set_update['name']
                 )
 
-def process_requests(
-    requests: any,
-    data_updates: list,
-    news_updates: list) -> tuple[list, list]:
-    """Process user inputs.
+    # Run updates in the background
+    scheduler.start()
+
+def initial_update() -> None:
+    """Fetch the first Covid data and news.
+
+    Saved Covid data is brought up to date (only fetching the newest
+    days when incremental_updates is set), and stays on the page until
+    then.
+    """
+    logger.log_infomation("Updating and fetching initial infomation")
+    covid_data_handler.update_covid_data()
+    covid_news_handling.update_news()
+
+def get_role() -> str:
+    """Get the role of this process, read the first time it is needed.
+
+    Return values:
+        role -- 'standalone', 'refresher' or 'reader' (see
+        snapshot_store.get_role)
+    """
+    global _role
+    if _role is None:
+        _role = snapshot_store.get_role()
+    return _role
+
+def create_app() -> Flask:
+    """Start the background work of this process's role, then get the app.
+
+    Importing this module doesn't fetch anything or start the scheduler;
+    run it, or serve create_app() (such as gunicorn 'main:create_app()').
+
+    Return values:
+        app -- the Flask app
+    """
+    global _started
+    if not _started:
+        _started = True
+        if get_role() != snapshot_store.READER:
+            start_background()
+        if get_role() == snapshot_store.REFRESHER:
+            scheduler.enter(0, sync_snapshots)
+    return app
+
+def process_requests(values: any) -> bool:
+    """Process user inputs (readers pass them to the refresher).
 
     Keyword arguements:
-        requests -- flask request,
-        data_updates -- list of data updates,
-        news_updates -- list of news updates
+        values -- form values or json of a posted request, or a command from a
+        reader
 
     Return values:
-        data_updates -- list of data updates,
-        news_updates -- list of news updates
+        processed -- whether the values held a user input
     """
-    global news_articles
-
-    # Respond to headline removal.
-    if 'notif' in requests.args:
-        logger.log_infomation('Headline removal request')
-        covid_news_handling.remove_headline(requests.args.get('notif'))
-        news_articles = covid_news_handling.get_news()
-    # Respond to new update creation.
-    elif 'update' in requests.args:
-        logger.log_infomation('New update request')
-        if 'covid-data' in requests.args:
-            covid_data_handler.schedule_covid_updates(
-                requests.args.get('update'), requests.args.get('two')
-                )
-            if requests.args.get('repeat'):
-                covid_data_handler.set_repeating_data_update(
-                    requests.args.get('two')
+    if get_role() == snapshot_store.READER:
+        if not {'notif', 'update', 'update_item'} & set(values):
+            return False
+        snapshot_store.send_command(dict(values))
+        return True
+
+    with write_lock:
+        # Respond to headline removal.
+        if 'notif' in values:
+            logger.log_infomation('Headline removal request')
+            covid_news_handling.remove_headline(values.get('notif'))
+        # Respond to new update creation.
+        elif 'update' in values:
+            logger.log_infomation('New update request')
+            if 'covid-data' in values:
+                covid_data_handler.schedule_covid_updates(
+                    values.get('update'), values.get('two')
                     )
-            data_updates = covid_data_handler.get_updates()
-        if 'news' in requests.args:
-            covid_news_handling.schedule_news_update(
-                requests.args.get('update'), requests.args.get('two')
-                )
-            if requests.args.get('repeat'):
-                covid_news_handling.set_repeating_news_update(
-                    requests.args.get('two')
+                if values.get('repeat'):
+                    covid_data_handler.set_repeating_data_update(
+                        values.get('two')
+                        )
+            if 'news' in values:
+                covid_news_handling.schedule_news_update(
+                    values.get('update'), values.get('two')
                     )
-            news_updates = covid_news_handling.get_updates()
-        # Check if user didn't select either update
-        elif 'covid-news' not in requests.args:
-            logger.log_warning('No update type selected')
-    # Respond to update removal.
-    elif 'update_item' in requests.args:
-        logger.log_infomation('Update removal request')
-        if covid_data_handler.remove_data_update(
-            requests.args.get('update_item')
-            ):
-            data_updates = covid_data_handler.get_updates()
-        if covid_news_handling.remove_news_update(
-            requests.args.get('update_item')
-            ):
-            news_updates = covid_news_handling.get_updates()
-
-    return data_updates, news_updates
+                if values.get('repeat'):
+                    covid_news_handling.set_repeating_news_update(
+                        values.get('two')
+                        )
+            # Check if user didn't select either update
+            elif 'covid-data' not in values:
+                logger.log_warning('No update type selected')
+        # Respond to update removal.
+        elif 'update_item' in values:
+            logger.log_infomation('Update removal request')
+            covid_data_handler.remove_data_update(values.get('update_item'))
+            covid_news_handling.remove_news_update(values.get('update_item'))
+        else:
+            return False
+    return True
+
+def get_snapshots() -> dict:
+    """Get snapshots of the covid data, headlines and updates.
+
+    Readers get the snapshots published by the refresher, other processes
+    make them from their own data.
+
+    Return values:
+        snapshots -- dictionary of name to (version, json-able data)
+    """
+    global local_snapshots
+
+    if get_role() == snapshot_store.READER:
+        return {
+            'covid':((), PLACEHOLDER_COVID_DATA),
+            'news':((), []),
+            'updates':((), []),
+            **snapshot_store.read()
+            }
+
+    covid_version, covid_data = covid_data_handler.get_covid_snapshot()
+    news_version, news_articles = covid_news_handling.get_news_snapshot()
+    updates_version = (
+        covid_data_handler.get_version()[1:] +
+        covid_news_handling.get_version()[1:]
+        )
+    version = (covid_version, news_version)+updates_version
+    if local_snapshots[0] != version:
+        updates = sorted(
+            covid_data_handler.get_updates()+covid_news_handling.get_updates(),
+            key=lambda item: item['time']
+            )
+        local_snapshots = (version, {
+            'covid':((covid_version,), covid_data or PLACEHOLDER_COVID_DATA),
+            'news':(
+                (news_version,),
+                [headline._asdict() for headline in news_articles]
+                ),
+            'updates':(updates_version, [
+                {
+                    key:update[key]
+                    for key in ('title', 'content', 'time', 'interval',
+                                'repeat', 'type')
+                    }
+                for update in updates
+                ])
+            })
+    return local_snapshots[1]
+
+def get_version(snapshots: dict = None) -> tuple:
+    """Get a version that changes whenever anything on the page does."""
+    snapshots = snapshots or get_snapshots()
+    return (
+        snapshots['covid'][0]+snapshots['news'][0]+snapshots['updates'][0]
+        )
+
+def sync_snapshots() -> None:
+    """Run user inputs from readers and publish the snapshots for them."""
+    for values in snapshot_store.take_commands():
+        process_requests(values)
+    snapshot_store.publish(get_snapshots())
+    scheduler.enter(
+        get_config().get('snapshot_interval', 1), sync_snapshots
+        )
+
+def build_view_model(snapshots: dict) -> dict:
+    """Build the values shown on the page from the current data.
+
+    Keyword arguements:
+        snapshots -- snapshots from get_snapshots
+
+    Return values:
+        view_model -- the arguements for the page template
+    """
+    covid_data = snapshots['covid'][1]
+    news_articles = snapshots['news'][1]
+    updates = snapshots['updates'][1]
+
+    # Format updates
+    logger.log_infomation('Configuring updates')
+
+    # Merge updates that are for both data and news
+    shown_updates = []
+    for update in updates:
+        if shown_updates and shown_updates[-1]['title'] == update['title']:
+            shown_updates[-1]['type'] = 'data and news'
+        else:
+            shown_updates.append({
+                'title':update['title'],
+                'content':update['content'],
+                'type':update['type']
+                })
+    for update in shown_updates:
+        update['content'] = update['content']+", "+update['type']
+
+    # Add link to each shown article
+    shown_articles = [
+        {
+            'title':news_article['title'],
+            'content':(news_article['content'] or '') + (
+                Markup('. See more <a href="{}">here</a>.').format(
+                    news_article['url']
+                    ) if news_article['url'] else ''
+                )
+            }
+        for news_article in news_articles[:4]
+        ]
+
+    return {
+        'updates':shown_updates[:5],
+        'title':get_config()['web_title'],
+        'location':covid_data['location'],
+        'local_7day_infections':covid_data['local_7day_infections'],
+        'areas':covid_data.get('areas', []),
+        'nation_location':covid_data['nation'],
+        'national_7day_infections':covid_data['national_7day_infections'],
+        'hospital_cases':'Hospital cases: '+str(covid_data['hospital_cases']),
+        'deaths_total':'Total deaths: '+str(covid_data['deaths']),
+        'news_articles':shown_articles,
+        'image':get_config()['image_path'],
+        'favicon':'static/images/'+get_config()['image_path']
+        }
 
 @app.route('/')
 @app.route('/index')
 def render_page() -> any:
     """Render the page.
 
+    The page only shows data; user inputs are posted to the api routes.
+    The page is only rendered again when the version changes. Clients
+    with the current content (by ETag) get an empty 304 response.
+
     Return values:
-        render_template -- render the html onto the webpage
+        response -- the (compressed) html of the webpage
     """
-    global covid_data, news_articles
-
-    # Run scheduler
-    logger.log_infomation('Scheduler running')
-    new_data = covid_data_handler.schedule_check_data()
-    new_news = covid_news_handling.schedule_check_news()
-
-    # Get latest updates
-    logger.log_infomation('Getting updates')
-    data_updates = covid_data_handler.get_updates()
-    news_updates = covid_news_handling.get_updates()
-
-    # Check if update should be repeated
-    if new_data:
-        logger.log_infomation('New covid data in main')
-        if isinstance(new_data['repeat'], bool):
-            covid_data_handler.schedule_covid_updates(
-                new_data['interval'],
-                new_data['title']
+    global page_cache
+
+    # Render the page if anything on it has changed
+    snapshots = get_snapshots()
+    version = get_version(snapshots)
+    if page_cache[0] != version:
+        logger.log_infomation('Rednering page')
+        with metrics.measure('render_template'):
+            html = render_template(
+                'index.html', **build_view_model(snapshots)
                 )
-            covid_data_handler.set_repeating_data_update(new_data['title'])
-            data_updates = covid_data_handler.get_updates()
-        covid_data = covid_data_handler.get_covid_data()
-    elif new_news:
-        logger.log_infomation('New news in main')
-        if isinstance(new_news['repeat'], bool):
-            covid_news_handling.schedule_news_update(
-                new_news['interval'],
-                new_news['title']
+        page_cache = (version, {'identity':html.encode('utf8')}, {})
+    _version, bodies, etags = page_cache
+
+    # Answer with the ETag, or the body in the best encoding
+    encoding = request.accept_encodings.best_match(
+        http_caching.encodings(), default='identity'
+        )
+    if encoding not in etags:
+        etags[encoding] = http_caching.make_etag(bodies['identity'], encoding)
+    etag = etags[encoding]
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        if encoding not in bodies:
+            bodies[encoding] = http_caching.compress(
+                bodies['identity'], encoding
                 )
-            covid_news_handling.set_repeating_news_update(new_news['title'])
-            news_updates = covid_news_handling.get_updates()
-        news_articles = covid_news_handling.get_news()
-
-    # Respond to user
-    data_updates, news_updates = process_requests(
-        request,
-        data_updates,
-        news_updates
+        response = make_response(bodies[encoding])
+        response.content_type = 'text/html; charset=utf-8'
+        if encoding != 'identity':
+            response.content_encoding = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
+
+def send_snapshot(name: str) -> any:
+    """Send a json snapshot, only encoding it when the version changes.
+
+    Keyword arguements:
+        name -- name of the snapshot
+
+    Return values:
+        response -- the json snapshot, or 304 if the client has it
+    """
+    version, data = get_snapshots()[name]
+    snapshot = api_cache.get(name)
+    if snapshot is None or snapshot[0] != version:
+        body = json.dumps(data).encode('utf8')
+        snapshot = (version, body, http_caching.make_etag(body))
+        api_cache[name] = snapshot
+
+    etag = snapshot[2]
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(snapshot[1])
+        response.content_type = 'application/json'
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@app.get('/api/covid')
+def api_covid() -> any:
+    """Get the covid data as json."""
+    return send_snapshot('covid')
+
+@app.get('/api/news')
+def api_news() -> any:
+    """Get the news headlines as json."""
+    return send_snapshot('news')
+
+@app.get('/api/updates')
+def api_updates() -> any:
+    """Get the scheduled updates as json."""
+    return send_snapshot('updates')
+
+def respond_to_post(field: str) -> any:
+    """Process a posted user input.
+
+    Keyword arguements:
+        field -- the field the input must have
+
+    Return values:
+        response -- json for json requests, otherwise a redirect to the page
+    """
+    if request.is_json:
+        values = request.get_json(silent=True)
+        if not isinstance(values, dict):
+            return {'error':'Expected a JSON object'}, 400
+    else:
+        values = request.form
+    if field not in values:
+        return {'error':'Missing '+field}, 400
+    process_requests(values)
+    if request.is_json:
+        return {'version':list(get_version())}
+    return redirect('/index', 303)
+
+@app.post('/api/news/remove')
+def api_remove_headline() -> any:
+    """Remove a headline (by its title in notif)."""
+    return respond_to_post('notif')
+
+@app.post('/api/updates')
+def api_add_update() -> any:
+    """Schedule an update (time in update, name in two)."""
+    return respond_to_post('update')
+
+@app.post('/api/updates/remove')
+def api_remove_update() -> any:
+    """Remove an update (by its name in update_item)."""
+    return respond_to_post('update_item')
+
+@app.get('/metrics')
+def send_metrics() -> any:
+    """Get the timing metrics and cache statistics in Prometheus format."""
+    if not metrics.is_enabled():
+        abort(404)
+    cache_stats = response_cache.get_stats()
+    cache_counters = {
+        'cache_'+source+'_'+counter: value
+        for source, counters in cache_stats.items()
+        for counter, value in counters.items() if counter != 'size'
+        }
+    cache_sizes = {
+        'cache_'+source+'_size': counters['size']
+        for source, counters in cache_stats.items()
+        }
+    response = make_response(
+        metrics.render_prometheus(cache_counters, cache_sizes)
         )
+    response.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
 
-    # Format updates
-    logger.log_infomation('Configuring updates')
-    updates = data_updates + news_updates
-    updates = sorted(updates, key=lambda item: item.get('time'))
+@app.route('/static/<path:filename>')
+def send_static(filename: str) -> any:
+    """Send a static file, using a precompressed copy if there is one.
 
-    # Merge updates that are for both data and news
-    temp_updates = []
-    updates_length = len(updates)
-    for i in range(updates_length):
-        if i == updates_length-1:
-            temp_updates.append(updates[i])
-        elif updates[i]['title'] == updates[i+1]['title']:
-            updates[i+1]['type'] = 'data and news'
-        else:
-            temp_updates.append(updates[i])
-    if temp_updates:
-        updates = temp_updates.copy()
-        for update in updates:
-            if update['type'] not in update['content']:
-                update['content'] = update['content']+", "+update['type']
-
-    # Add link to each article
-    for news_article in news_articles:
-        if ". See more " not in news_article['content']:
-            url = news_article['url']
-            news_article['content'] += Markup(
-                '. See more <a href='+url+'>here</a>.'
-            )
+    Keyword arguements:
+        filename -- path of the file in static/
 
-    logger.log_infomation('Rednering page')
-    return render_template(
-        'index.html',
-        updates=updates[:5],
-        title=configerables['web_title'],
-        location=covid_data['location'],
-        local_7day_infections=covid_data['local_7day_infections'],
-        nation_location=covid_data['nation'],
-        national_7day_infections=covid_data['national_7day_infections'],
-        hospital_cases='Hospital cases: '+str(covid_data['hospital_cases']),
-        deaths_total='Total deaths: '+str(covid_data['deaths']),
-        news_articles=news_articles[:4],
-        image=configerables['image_path'],
-        favicon='static/images/'+configerables['image_path']
+    Return values:
+        response -- the static file
+    """
+    accepted = [
+        encoding for encoding in http_caching.EXTENSIONS
+        if request.accept_encodings[encoding]
+        ]
+    sent_filename, encoding = http_caching.precompressed_file(
+        'static', filename, accepted
+        )
+    response = send_from_directory(
+        'static',
+        sent_filename,
+        mimetype=mimetypes.guess_type(filename)[0]
         )
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    return response
 
 if __name__ == '__main__':
-    app.run()
+    create_app().run(threaded=True)
@@ -0,0 +1,232 @@
+"""Metrics module
+
+Times each stage of fetching, processing and showing the data, keeping a
+histogram of durations, a count of errors and the time of the last
+success for every stage, plus named counters. They are shown in the
+Prometheus text format at /metrics.
+
+Metrics are turned off with "enabled": false under "metrics" in the
+config file, leaving one check per timed call.
+
+Functions:
+    is_enabled -- checks if metrics are being recorded
+    timed -- decorator that times a function as a stage
+    measure -- context manager that times a block as a stage
+    record -- records one run of a stage
+    increment -- adds to a counter
+    get_stages -- gets the recorded stages
+    render_prometheus -- gets every metric in Prometheus text format
+    reset -- clears every metric
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from shared_functions import get_config
+
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_enabled = None
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+
+def is_enabled() -> bool:
+    """Check if metrics are being recorded (set in the config file)."""
+    global _enabled
+    if _enabled is None:
+        _enabled = get_config().get('metrics', {}).get('enabled', True)
+    return _enabled
+
+def timed(stage: str) -> callable:
+    """Make a decorator that times every call of a function.
+
+    Keyword arguements:
+        stage -- name of the stage
+
+    Return values:
+        decorator -- decorator for the function
+    """
+    def decorator(function: callable) -> callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                record(stage, time.perf_counter()-start, False)
+                raise
+            record(stage, time.perf_counter()-start)
+            return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def measure(stage: str):
+    """Time the block inside a with statement.
+
+    Keyword arguements:
+        stage -- name of the stage
+    """
+    if not is_enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record(stage, time.perf_counter()-start, False)
+        raise
+    record(stage, time.perf_counter()-start)
+
+def record(stage: str, seconds: float, success: bool = True) -> None:
+    """Record one run of a stage.
+
+    Keyword arguements:
+        stage -- name of the stage,
+        seconds -- how long it took
+
+    Optional arguements:
+        success -- False if it raised an error
+    """
+    with _lock:
+        if stage not in _stages:
+            _stages[stage] = {
+                'buckets':[0]*len(BUCKETS),
+                'count':0,
+                'sum':0.0,
+                'errors':0,
+                'last_success':None
+                }
+        stats = _stages[stage]
+        for bucket, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats['buckets'][bucket] += 1
+                break
+        stats['count'] += 1
+        stats['sum'] += seconds
+        if success:
+            stats['last_success'] = time.time()
+        else:
+            stats['errors'] += 1
+
+def increment(counter: str, amount: int = 1) -> None:
+    """Add to a counter.
+
+    Keyword arguements:
+        counter -- name of the counter
+
+    Optional arguements:
+        amount -- amount to add
+    """
+    if not is_enabled():
+        return
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0)+amount
+
+def get_stages() -> dict:
+    """Get a copy of the recorded stages.
+
+    Return values:
+        stages -- dictionary of stage to its buckets (not cumulative),
+        count, sum of seconds, errors and last success time
+    """
+    with _lock:
+        return {
+            stage: {**stats, 'buckets':list(stats['buckets'])}
+            for stage, stats in _stages.items()
+            }
+
+def _labels(**labels: str) -> str:
+    """Format Prometheus labels."""
+    return '{'+','.join(
+        name+'="'+str(value).replace('\\', '\\\\').replace('"', '\\"')+'"'
+        for name, value in labels.items()
+        )+'}'
+
+def render_prometheus(
+    extra_counters: dict = None,
+    extra_gauges: dict = None
+    ) -> str:
+    """Get every metric in the Prometheus text format.
+
+    Optional arguements:
+        extra_counters -- more counters to show, of name to value,
+        extra_gauges -- values that can go down to show, of name to value
+
+    Return values:
+        text -- the metrics
+    """
+    stages = get_stages()
+    with _lock:
+        counters = {**_counters, **(extra_counters or {})}
+
+    lines = [
+        '# HELP dashboard_stage_duration_seconds Time taken by each stage.',
+        '# TYPE dashboard_stage_duration_seconds histogram'
+        ]
+    for stage, stats in sorted(stages.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(
+                'dashboard_stage_duration_seconds_bucket'+
+                _labels(stage=stage, le=bound)+' '+str(cumulative)
+                )
+        lines.append(
+            'dashboard_stage_duration_seconds_bucket'+
+            _labels(stage=stage, le='+Inf')+' '+str(stats['count'])
+            )
+        lines.append(
+            'dashboard_stage_duration_seconds_sum'+_labels(stage=stage)+
+            ' '+repr(stats['sum'])
+            )
+        lines.append(
+            'dashboard_stage_duration_seconds_count'+_labels(stage=stage)+
+            ' '+str(stats['count'])
+            )
+
+    lines.append('# HELP dashboard_stage_errors_total Errors in each stage.')
+    lines.append('# TYPE dashboard_stage_errors_total counter')
+    for stage, stats in sorted(stages.items()):
+        lines.append(
+            'dashboard_stage_errors_total'+_labels(stage=stage)+
+            ' '+str(stats['errors'])
+            )
+
+    lines.append(
+        '# HELP dashboard_stage_last_success_timestamp_seconds '
+        'When each stage last succeeded.'
+        )
+    lines.append('# TYPE dashboard_stage_last_success_timestamp_seconds gauge')
+    for stage, stats in sorted(stages.items()):
+        if stats['last_success'] is not None:
+            lines.append(
+                'dashboard_stage_last_success_timestamp_seconds'+
+                _labels(stage=stage)+' '+repr(stats['last_success'])
+                )
+
+    lines.append('# HELP dashboard_events_total Counted events.')
+    lines.append('# TYPE dashboard_events_total counter')
+    for counter, value in sorted(counters.items()):
+        lines.append(
+            'dashboard_events_total'+_labels(event=counter)+' '+str(value)
+            )
+
+    lines.append('# HELP dashboard_gauge Current values.')
+    lines.append('# TYPE dashboard_gauge gauge')
+    for gauge, value in sorted((extra_gauges or {}).items()):
+        lines.append(
+            'dashboard_gauge'+_labels(name=gauge)+' '+str(value)
+            )
+    return '\n'.join(lines)+'\n'
+
+def reset() -> None:
+    """Clear every metric."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
@@ -0,0 +1,195 @@
+"""Query plan module
+
+Turns the figures wanted from the Covid data (the "metric_spec" in the
+config file) into a plan once: the columns to fetch or read, and how to
+work out each figure from them. The plan is then run over csv files or
+Cov19API rows in one pass, newest row first, stopping as soon as every
+figure is known. Only the planned columns are converted from text.
+
+Each figure in the spec names a metric (a column of the data) and an
+aggregate:
+    latest -- the newest value
+    sum, mean, max, min -- of the values over a number of days
+Days are counted from the newest row with a value, after skipping the
+first skip rows (by default 1 for sum, mean, max and min, as the newest
+day is incomplete, and 0 for latest).
+
+Functions:
+    compile_plan -- makes a plan from a metric spec
+    get_plan -- gets the plan of the config file's metric spec
+    api_structure -- gets the Cov19API structure a plan needs
+    run_rows -- works out the figures of a plan from Cov19API rows
+    run_csv -- works out the figures of a plan from a csv file
+"""
+import os
+
+import logger
+from shared_functions import get_config
+
+# Fields of a data row that describe the area rather than a metric
+AREA_FIELDS = ('areaCode', 'areaName', 'areaType', 'date')
+AGGREGATES = ('latest', 'sum', 'mean', 'max', 'min')
+# Figures the dashboard always shows
+DEFAULT_SPEC = {
+    'infections_7day':{
+        'metric':'newCasesBySpecimenDate', 'aggregate':'sum', 'days':7
+        },
+    'hospital_cases':{'metric':'hospitalCases', 'aggregate':'latest'},
+    'deaths':{'metric':'cumDailyNsoDeathsByDeathDate', 'aggregate':'latest'}
+    }
+
+_plan = None
+
+def compile_plan(metric_spec: dict) -> dict:
+    """Make a plan from a metric spec.
+
+    Keyword arguements:
+        metric_spec -- dictionary of figure name to a dictionary of its
+        metric, aggregate, and optionally days and skip
+
+    Return values:
+        plan -- dictionary of the columns to read (each read once, however
+        many figures use it) and a step for each figure
+    """
+    columns = []
+    steps = []
+    for name, figure in metric_spec.items():
+        aggregate = figure.get('aggregate', 'latest')
+        if aggregate not in AGGREGATES or 'metric' not in figure:
+            logger.log_error('Invalid metric spec for '+name)
+            continue
+        if figure['metric'] not in columns:
+            columns.append(figure['metric'])
+        steps.append({
+            'name':name,
+            'column':columns.index(figure['metric']),
+            'aggregate':aggregate,
+            'skip':figure.get('skip', 0 if aggregate == 'latest' else 1),
+            'days':1 if aggregate == 'latest' else figure.get('days', 7)
+            })
+    return {'columns':tuple(columns), 'steps':tuple(steps)}
+
+def get_plan() -> dict:
+    """Get the plan of the default figures and the config file's spec."""
+    global _plan
+    if _plan is None:
+        _plan = compile_plan({
+            **DEFAULT_SPEC, **get_config().get('metric_spec', {})
+            })
+    return _plan
+
+def api_structure(plan: dict) -> dict:
+    """Get the Cov19API structure that fetches only the plan's columns.
+
+    Keyword arguements:
+        plan -- plan from compile_plan
+
+    Return values:
+        structure -- dictionary of the area fields and planned metrics
+    """
+    return {field: field for field in AREA_FIELDS+plan['columns']}
+
+def _run(plan: dict, rows) -> dict:
+    """Work out the figures of a plan from rows of its column values."""
+    # Rows left to skip (None until a value is seen), days left and
+    # values of each step still counting
+    active = [
+        [step['column'], None, step['skip'], step['days'], []]
+        for step in plan['steps']
+        ]
+    values = [state[4] for state in active]
+
+    for row in rows:
+        finished = False
+        for state in active:
+            value = row[state[0]]
+            if state[1] is None:
+                if not value:
+                    continue
+                state[1] = state[2]
+            if state[1]:
+                state[1] -= 1
+                continue
+            state[4].append(value)
+            state[3] -= 1
+            if not state[3]:
+                finished = True
+        if finished:
+            active = [state for state in active if state[3]]
+            if not active:
+                break
+
+    figures = {}
+    for step, step_values in zip(plan['steps'], values):
+        counted = [value for value in step_values if value is not None]
+        if step['aggregate'] == 'latest':
+            figure = counted[0] if counted else None
+        elif step['aggregate'] == 'sum':
+            figure = sum(counted)
+        elif step['aggregate'] == 'mean':
+            figure = sum(counted)/len(step_values) if step_values else None
+        elif counted:
+            figure = max(counted) if step['aggregate'] == 'max' else min(
+                counted
+                )
+        else:
+            figure = None
+        figures[step['name']] = figure
+    return figures
+
+def run_rows(plan: dict, rows: list) -> dict:
+    """Work out the figures of a plan from Cov19API rows of one area.
+
+    Keyword arguements:
+        plan -- plan from compile_plan,
+        rows -- data rows, newest first
+
+    Return values:
+        figures -- dictionary of figure name to value (None if unknown)
+    """
+    columns = plan['columns']
+    return _run(plan, (
+        tuple(row.get(column) for column in columns) for row in rows
+        ))
+
+def run_csv(plan: dict, csv_source) -> dict:
+    """Work out the figures of a plan from a csv file of one area.
+
+    Each line is only split up to the last planned column, and only the
+    planned cells are converted to numbers.
+
+    Keyword arguements:
+        plan -- plan from compile_plan,
+        csv_source -- csv data filename or an iterable of csv lines, with
+        a header line then the newest row first
+
+    Return values:
+        figures -- dictionary of figure name to value (None if unknown)
+    """
+    if isinstance(csv_source, (str, os.PathLike)):
+        with open(csv_source, encoding='utf8') as csv_file:
+            return run_csv(plan, csv_file)
+
+    lines = iter(csv_source)
+    header = next(lines, '').strip().split(',')
+    indexes = []
+    for column in plan['columns']:
+        if column in header:
+            indexes.append(header.index(column))
+        else:
+            logger.log_warning('No '+column+' column in csv data')
+            indexes.append(None)
+    found = [index for index in indexes if index is not None]
+    max_split = max(found)+1 if found else 0
+
+    def rows():
+        for line in lines:
+            cells = line.rstrip('\r\n').split(',', max_split)
+            width = len(cells)
+            yield [
+                int(cells[index]) if (
+                    index is not None and index < width and cells[index]
+                    ) else None
+                for index in indexes
+                ]
+    return _run(plan, rows())
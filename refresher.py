@@ -0,0 +1,19 @@
+"""Refresher module
+
+Runs the refresher without the webpage: fetches the data, runs the
+updates and publishes them for the reader processes to show.
+
+Run:
+    python refresher.py
+"""
+import os
+import time
+
+os.environ['DASHBOARD_ROLE'] = 'refresher'
+
+import main # pylint: disable=wrong-import-position
+
+if __name__ == '__main__':
+    main.create_app()
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,144 @@
+"""Response cache module.
+
+Caches API responses in memory for each source (covid and news), so
+refreshes close together share one network request.
+
+A response younger than the source's ttl is returned straight away. Up to
+stale_ttl seconds after that, the old response is still returned but one
+background request replaces it. Older responses are fetched again, with
+only one request made for callers asking at the same time.
+
+Functions:
+    cached_request -- gets a response from the cache or the API
+    get_stats -- gets the hit and miss counters
+    clear -- empties the cache
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import logger
+from shared_functions import get_config
+
+DEFAULT_SETTINGS = {'ttl':300, 'stale_ttl':3600, 'max_entries':128}
+
+_caches = {}
+_stats = {}
+_pending = {}
+_revalidating = set()
+_lock = threading.Lock()
+
+def _settings(source: str) -> dict:
+    """Get the cache settings of a source."""
+    return {
+        **DEFAULT_SETTINGS,
+        **get_config().get('cache', {}).get(source, {})
+        }
+
+def _source_stats(source: str) -> dict:
+    """Get the counters of a source (the lock must be held)."""
+    if source not in _stats:
+        _stats[source] = dict.fromkeys(
+            ('hits', 'stale_hits', 'misses', 'revalidations', 'evictions'), 0
+            )
+    return _stats[source]
+
+def _save(source: str, key: tuple, response: any) -> None:
+    """Save a response, evicting the least recently used ones."""
+    with _lock:
+        cache = _caches.setdefault(source, OrderedDict())
+        cache[key] = (response, time.time())
+        cache.move_to_end(key)
+        while len(cache) > _settings(source)['max_entries']:
+            cache.popitem(last=False)
+            _source_stats(source)['evictions'] += 1
+
+def _revalidate(source: str, key: tuple, fetch: callable) -> None:
+    """Replace a stale response in the background."""
+    try:
+        response = fetch()
+        if response:
+            _save(source, key, response)
+    except Exception as error:
+        logger.log_error('Revalidating '+source+' cache failed: '+str(error))
+    finally:
+        with _lock:
+            _revalidating.discard((source, key))
+
+def cached_request(source: str, key: tuple, fetch: callable) -> any:
+    """Get a response from the cache, or from fetch if it is too old.
+
+    Keyword arguements:
+        source -- name of the API ('covid' or 'news'),
+        key -- arguements that identify the request,
+        fetch -- function that makes the request
+
+    Return values:
+        response -- the cached or newly fetched response
+    """
+    settings = _settings(source)
+    with _lock:
+        stats = _source_stats(source)
+        cache = _caches.setdefault(source, OrderedDict())
+        entry = cache.get(key)
+        if entry:
+            cache.move_to_end(key)
+            age = time.time()-entry[1]
+
+            # Return fresh responses, and stale ones while revalidating
+            if age < settings['ttl']:
+                stats['hits'] += 1
+                return entry[0]
+            if age < settings['ttl']+settings['stale_ttl']:
+                stats['stale_hits'] += 1
+                if (source, key) not in _revalidating:
+                    stats['revalidations'] += 1
+                    _revalidating.add((source, key))
+                    threading.Thread(
+                        target=_revalidate,
+                        args=(source, key, fetch),
+                        daemon=True
+                        ).start()
+                return entry[0]
+
+        # Only let the first caller make the request
+        stats['misses'] += 1
+        waiting = _pending.get((source, key))
+        if waiting is None:
+            _pending[(source, key)] = threading.Event()
+
+    if waiting is not None:
+        logger.log_infomation('Waiting for '+source+' request')
+        waiting.wait()
+        with _lock:
+            entry = _caches[source].get(key)
+        if entry:
+            return entry[0]
+        return fetch()
+
+    try:
+        response = fetch()
+        if response:
+            _save(source, key, response)
+        return response
+    finally:
+        with _lock:
+            _pending.pop((source, key)).set()
+
+def get_stats() -> dict:
+    """Get the cache counters of each source.
+
+    Return values:
+        stats -- dictionary of source to its counters and size
+    """
+    with _lock:
+        return {
+            source: {**counters, 'size':len(_caches.get(source, ()))}
+            for source, counters in _stats.items()
+            }
+
+def clear() -> None:
+    """Empty the cache and reset the counters."""
+    with _lock:
+        _caches.clear()
+        _stats.clear()
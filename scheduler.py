@@ -0,0 +1,95 @@
+"""Scheduler module
+
+Runs every scheduled data and news update on one background thread, so
+updates happen on time whether or not the page is being viewed.
+
+Functions:
+    enter -- schedules a job
+    cancel -- cancels a scheduled job
+    start -- starts the scheduler thread
+    is_running -- checks if the scheduler thread is running
+"""
+import sched
+import threading
+import time
+
+import logger
+import metrics
+
+_wakeup = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+def _delay(seconds: float) -> None:
+    """Wait for the next job, waking early if a job is added."""
+    _wakeup.wait(seconds)
+    _wakeup.clear()
+
+schedule = sched.scheduler(time.time, _delay)
+
+def _run_job(action: callable, argument: tuple) -> None:
+    """Run a job, logging any error so the scheduler keeps running."""
+    start = time.perf_counter()
+    success = True
+    try:
+        action(*argument)
+    except Exception as error:
+        logger.log_error('Scheduled job failed: '+str(error))
+        success = False
+    if metrics.is_enabled():
+        metrics.record('scheduled_job', time.perf_counter()-start, success)
+
+def enter(delay: float, action: callable, argument: tuple = ()) -> any:
+    """Schedule a job.
+
+    Keyword arguements:
+        delay -- seconds until the job runs,
+        action -- function to run
+
+    Optional arguements:
+        argument -- arguements for the function
+
+    Return values:
+        event -- the scheduled event (used to cancel it)
+    """
+    event = schedule.enter(delay, 1, _run_job, (action, argument))
+    _wakeup.set()
+    return event
+
+def cancel(event: any) -> bool:
+    """Cancel a scheduled job.
+
+    Keyword arguements:
+        event -- the event from enter
+
+    Return values:
+        cancelled -- whether the job was still waiting to run
+    """
+    try:
+        schedule.cancel(event)
+    except ValueError:
+        return False
+    _wakeup.set()
+    return True
+
+def _run() -> None:
+    """Run jobs as they become due, waiting when there are none."""
+    while True:
+        schedule.run()
+        _wakeup.wait()
+        _wakeup.clear()
+
+def start() -> None:
+    """Start the scheduler thread if it isn't already running."""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            logger.log_infomation('Starting scheduler')
+            _thread = threading.Thread(
+                target=_run, name='scheduler', daemon=True
+                )
+            _thread.start()
+
+def is_running() -> bool:
+    """Check if the scheduler thread is running."""
+    return _thread is not None and _thread.is_alive()
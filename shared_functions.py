@@ -1,36 +1,201 @@
 """Common functions betwee data and news handling modules
 
 Functions
+    get_config -- gets the settings in config.json
+    new_update_registry -- makes an empty registry of scheduled updates
+    add_scheduled_update -- adds an update to a registry
+    set_scheduled_event -- records the scheduler event of an update
     remove_scheduled_update -- removes future update
+    complete_scheduled_update -- removes an update that has run
+    is_scheduled -- checks if an update is still scheduled
+    get_scheduled_update -- gets a scheduled update by name
+    set_scheduled_repeat -- makes a scheduled update repeat
+    next_scheduled_update -- gets the next update due
+    list_scheduled_updates -- gets the scheduled updates in time order
     time_format -- formats time
 """
+import heapq
+import itertools
+import json
+import threading
 import time
 
 from logger import log_infomation
 
-def remove_scheduled_update(update_name: str, updates: list) -> tuple[list, bool]:
-    """Cancel scheduled updates.
+# Breaks ties between updates due at the same time in the heap
+_update_counter = itertools.count()
+_config = None
+_config_lock = threading.Lock()
+
+def get_config() -> dict:
+    """Get the settings in config.json, loading them the first time.
+
+    Return values:
+        configerables -- dictionary of the settings
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                with open("config.json", 'r', encoding='utf8') as config:
+                    _config = json.load(config)
+    return _config
+
+def new_update_registry() -> dict:
+    """Make an empty registry of scheduled updates.
+
+    Updates are kept in a heap ordered by time, with dictionaries from
+    name and time to update, and from name to scheduler event. Removed
+    updates are left in the heap and skipped when they reach the top. The
+    version goes up on every change, and the snapshot holds the updates in
+    order for that version.
+
+    Return values:
+        registry -- the empty registry
+    """
+    return {
+        'heap':[],
+        'names':{},
+        'times':{},
+        'events':{},
+        'version':0,
+        'snapshot':(0, ()),
+        'lock':threading.RLock()
+        }
+
+def add_scheduled_update(update: dict, registry: dict) -> bool:
+    """Add an update to a registry, unless it is a repeat.
+
+    Keyword arguements:
+        update -- update with a title and time,
+        registry -- registry of updates
+
+    Return values:
+        added -- False if an update has the same time or name
+    """
+    with registry['lock']:
+        if (update['time'] in registry['times']) or (
+            update['title'] in registry['names']
+            ):
+            return False
+        registry['names'][update['title']] = update
+        registry['times'][update['time']] = update
+        heapq.heappush(
+            registry['heap'], (update['time'], next(_update_counter), update)
+            )
+        registry['version'] += 1
+    return True
+
+def set_scheduled_event(update: dict, event: any, registry: dict) -> None:
+    """Record the scheduler event that runs an update.
+
+    Keyword arguements:
+        update -- the update,
+        event -- event from scheduler.enter,
+        registry -- registry of updates
+    """
+    with registry['lock']:
+        if is_scheduled(update, registry):
+            registry['events'][update['title']] = event
+
+def remove_scheduled_update(update_name: str, registry: dict) -> bool:
+    """Cancel a scheduled update and its scheduler event.
 
     Keyword arguements:
         update_name -- name of the update,
-        updates -- list of updates
+        registry -- registry of updates
 
     Return values:
-        updates -- list of updates,
         removed -- whether an updates was removed of not
     """
     log_infomation('Removing scheduled update '+update_name)
-    removed = False
+    with registry['lock']:
+        update = registry['names'].get(update_name)
+        if update is None:
+            return False
+        event = registry['events'].get(update_name)
+        complete_scheduled_update(update, registry)
+    if event is not None:
+        # Imported here, as the scheduler imports this module
+        import scheduler
+        scheduler.cancel(event)
+    return True
+
+def complete_scheduled_update(update: dict, registry: dict) -> None:
+    """Remove an update from a registry.
+
+    Keyword arguements:
+        update -- the update,
+        registry -- registry of updates
+    """
+    with registry['lock']:
+        if registry['names'].get(update['title']) is update:
+            del registry['names'][update['title']]
+            del registry['times'][update['time']]
+            registry['events'].pop(update['title'], None)
+            registry['version'] += 1
+
+        # Drop removed updates from the top of the heap, and rebuild the
+        # heap if it is mostly removed updates
+        heap = registry['heap']
+        while heap and not is_scheduled(heap[0][2], registry):
+            heapq.heappop(heap)
+        if len(heap) > 2*len(registry['names'])+16:
+            heap[:] = [
+                entry for entry in heap if is_scheduled(entry[2], registry)
+                ]
+            heapq.heapify(heap)
+
+def is_scheduled(update: dict, registry: dict) -> bool:
+    """Check if an update is still in a registry."""
+    return registry['names'].get(update['title']) is update
+
+def get_scheduled_update(update_name: str, registry: dict) -> dict or None:
+    """Get a scheduled update by name (None if there isn't one)."""
+    return registry['names'].get(update_name)
 
-    # Find and remove update
-    for update in updates:
-        if update['title'] == update_name:
-            update['schedule'].cancel(update['schedule'].queue[0])
-            updates.remove(update)
-            removed = True
-            break
+def set_scheduled_repeat(update_name: str, registry: dict) -> bool:
+    """Make a scheduled update repeat.
 
-    return removed
+    Keyword arguements:
+        update_name -- name of the update,
+        registry -- registry of updates
+
+    Return values:
+        changed -- whether an update was found
+    """
+    with registry['lock']:
+        update = registry['names'].get(update_name)
+        if update is None:
+            return False
+        update['repeat'] = True
+        # Readers cache by version, so they must see the change
+        registry['version'] += 1
+    return True
+
+def next_scheduled_update(registry: dict) -> dict or None:
+    """Get the next update due (None if there isn't one)."""
+    with registry['lock']:
+        heap = registry['heap']
+        while heap and not is_scheduled(heap[0][2], registry):
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+def list_scheduled_updates(registry: dict) -> list:
+    """Get the scheduled updates, earliest first.
+
+    The list is copied from a snapshot that is only rebuilt after the
+    registry changes, so reads don't wait for the lock.
+    """
+    snapshot = registry['snapshot']
+    if snapshot[0] != registry['version']:
+        with registry['lock']:
+            snapshot = (registry['version'], tuple(
+                entry[2] for entry in sorted(registry['heap'])
+                if is_scheduled(entry[2], registry)
+                ))
+            registry['snapshot'] = snapshot
+    return list(snapshot[1])
 
 def time_format(time_of_day: str) -> tuple:
     """Convert the format of the time for use with the time module
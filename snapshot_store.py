@@ -0,0 +1,146 @@
+"""Snapshot store module.
+
+Shares the dashboard between processes. One refresher process fetches
+and schedules updates, and publishes snapshots of the covid data,
+headlines and updates to a SQLite database. Web worker processes only
+read the snapshots, and pass user inputs back to the refresher as
+commands.
+
+Functions:
+    get_role -- gets the role of this process
+    publish -- saves snapshots for readers
+    read -- gets the latest published snapshots
+    send_command -- queues a user input for the refresher
+    take_commands -- gets and removes the queued user inputs
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import logger
+from shared_functions import get_config
+
+# Roles a process can have
+STANDALONE = 'standalone'
+REFRESHER = 'refresher'
+READER = 'reader'
+
+# SQLite file of the snapshots, from the config file unless set
+database = None
+# Identifies this run of the refresher, so versions from a restarted
+# refresher never match older ones
+run_id = time.time_ns()
+
+_local = threading.local()
+_published = {}
+
+def get_role() -> str:
+    """Get the role of this process.
+
+    Set with the DASHBOARD_ROLE environment variable, or role in the config
+    file: 'standalone' (the default), 'refresher' or 'reader'.
+    """
+    return os.environ.get(
+        'DASHBOARD_ROLE', get_config().get('role', STANDALONE)
+        )
+
+def _connection() -> sqlite3.Connection:
+    """Get this thread's connection to the database."""
+    if getattr(_local, 'connection', None) is None:
+        connection = sqlite3.connect(
+            database or get_config().get(
+                'snapshot_database', 'dashboard_snapshots.db'
+                ),
+            timeout=10
+            )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS snapshots '
+            '(name TEXT PRIMARY KEY, version TEXT, payload TEXT)'
+            )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS commands '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT)'
+            )
+        connection.commit()
+        _local.connection = connection
+        _local.data_version = None
+        _local.snapshots = {}
+    return _local.connection
+
+def publish(snapshots: dict) -> None:
+    """Save the snapshots that have changed since they were last published.
+
+    Keyword arguements:
+        snapshots -- dictionary of name to (version, json-able data)
+    """
+    changed = [
+        (name, json.dumps([run_id, *version]), json.dumps(data))
+        for name, (version, data) in snapshots.items()
+        if _published.get(name) != version
+        ]
+    if not changed:
+        return
+
+    logger.log_infomation('Publishing snapshots')
+    connection = _connection()
+    with connection:
+        connection.executemany(
+            'INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)', changed
+            )
+    for name, (version, _data) in snapshots.items():
+        _published[name] = version
+    # data_version doesn't change for this connection's own writes
+    _local.data_version = None
+
+def read() -> dict:
+    """Get the latest published snapshots.
+
+    They are only read from the database after it has changed.
+
+    Return values:
+        snapshots -- dictionary of name to (version, data)
+    """
+    connection = _connection()
+    data_version = connection.execute('PRAGMA data_version').fetchone()[0]
+    if data_version != _local.data_version:
+        _local.snapshots = {
+            name: (tuple(json.loads(version)), json.loads(payload))
+            for name, version, payload in connection.execute(
+                'SELECT name, version, payload FROM snapshots'
+                )
+            }
+        _local.data_version = data_version
+    return _local.snapshots
+
+def send_command(values: dict) -> None:
+    """Queue a user input for the refresher.
+
+    Keyword arguements:
+        values -- the user input
+    """
+    logger.log_infomation('Sending user input to the refresher')
+    connection = _connection()
+    with connection:
+        connection.execute(
+            'INSERT INTO commands (payload) VALUES (?)', (json.dumps(values),)
+            )
+
+def take_commands() -> list:
+    """Get and remove the queued user inputs, oldest first.
+
+    Return values:
+        commands -- list of user inputs
+    """
+    connection = _connection()
+    with connection:
+        rows = connection.execute(
+            'SELECT id, payload FROM commands ORDER BY id'
+            ).fetchall()
+        if rows:
+            connection.execute(
+                'DELETE FROM commands WHERE id <= ?', (rows[-1][0],)
+                )
+    return [json.loads(payload) for _id, payload in rows]
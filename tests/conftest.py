@@ -0,0 +1,34 @@
+"""Fixtures shared by the tests.
+
+The tests run offline, against the fake Covid and News API servers of
+fake_servers.py, with the Covid data store in a temporary folder.
+"""
+import pytest
+
+import covid_store
+import fake_servers
+from shared_functions import get_config
+
+@pytest.fixture(scope='session', autouse=True)
+def fake_apis(tmp_path_factory):
+    """Point the API endpoints at fake servers for the whole session."""
+    servers = fake_servers.start({
+        'covid_port':0, 'news_port':0, 'latency':0, 'error_rate':0
+        })
+    covid_host, covid_port = servers[0].server_address
+    news_host, news_port = servers[1].server_address
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setitem(
+            get_config(), 'covid_api_endpoint',
+            'http://'+covid_host+':'+str(covid_port)+'/v1/data'
+            )
+        monkeypatch.setitem(
+            get_config(), 'news_api_endpoint',
+            'http://'+news_host+':'+str(news_port)+'/v2/everything'
+            )
+        monkeypatch.setattr(
+            covid_store, 'store_directory',
+            str(tmp_path_factory.mktemp('covid_store'))
+            )
+        yield servers
+    fake_servers.stop(servers)
@@ -0,0 +1,59 @@
+import aggregates
+from covid_data_handler import process_covid_country_dict_data
+from fake_servers import covid_rows
+from shared_functions import get_config
+
+def test_add_api_data():
+    aggregates.clear()
+    data = {'data':covid_rows('nation', 'England', 60)}
+    aggregates.add_api_data(data)
+    _nation, infections, hospital_cases, deaths = (
+        process_covid_country_dict_data(data)
+        )
+    figures = aggregates.get_aggregates('nation', 'England')
+    assert figures['sum'] == infections
+    assert figures['latest_date'] == data['data'][1]['date']
+    assert aggregates.get_aggregates(
+        'nation', 'England', 'hospitalCases'
+        )['latest'] == hospital_cases
+    assert aggregates.get_aggregates(
+        'nation', 'England', 'cumDailyNsoDeathsByDeathDate'
+        )['latest'] == deaths
+
+def test_new_days():
+    aggregates.clear()
+    rows = covid_rows('ltla', 'Exeter', 60)
+    aggregates.add_api_data({'data':rows[30:]})
+    # Add the newer days one at a time, oldest first
+    for row in reversed(rows[:30]):
+        aggregates.add_value(
+            'ltla', 'Exeter', 'newCasesBySpecimenDate',
+            row['date'], row['newCasesBySpecimenDate']
+            )
+    cases = [row['newCasesBySpecimenDate'] for row in rows]
+    figures = aggregates.get_aggregates('ltla', 'Exeter')
+    assert figures['sum'] == sum(cases[2:9])
+    assert figures['delta'] == sum(cases[2:9])-sum(cases[9:16])
+    assert figures['mean'] == round(sum(cases[2:9])/7, 1)
+
+def test_revised_day():
+    aggregates.clear()
+    rows = covid_rows('ltla', 'Exeter', 30)
+    aggregates.add_api_data({'data':rows})
+    before = aggregates.get_aggregates('ltla', 'Exeter')['sum']
+    aggregates.add_value(
+        'ltla', 'Exeter', 'newCasesBySpecimenDate', rows[3]['date'],
+        rows[3]['newCasesBySpecimenDate']+10
+        )
+    assert aggregates.get_aggregates('ltla', 'Exeter')['sum'] == before+10
+
+def test_per_100k(monkeypatch):
+    aggregates.clear()
+    settings = get_config().get('aggregates', {})
+    monkeypatch.setitem(get_config(), 'aggregates', {
+        **settings,
+        'populations':{**settings.get('populations', {}), 'Test area':200_000}
+        })
+    aggregates.add_api_data({'data':covid_rows('ltla', 'Test area', 30)})
+    figures = aggregates.get_aggregates('ltla', 'Test area')
+    assert figures['per_100k'] == round(figures['sum']/2, 1)
@@ -0,0 +1,118 @@
+import bulk_ingest
+import covid_store
+
+def use_store(monkeypatch, directory):
+    monkeypatch.setattr(covid_store, 'store_directory', str(directory))
+    monkeypatch.setattr(covid_store, '_index', None)
+    monkeypatch.setattr(covid_store, '_maps', {})
+
+def write_exports(folder):
+    with open('nation_2021-10-28.csv', encoding='utf8') as csv_file:
+        lines = csv_file.readlines()
+    # An older export without the newest day, then the full one
+    (folder / 'nation_2021-10-27.csv').write_text(
+        lines[0]+''.join(lines[2:]), encoding='utf8'
+        )
+    (folder / 'nation_2021-10-28.csv').write_text(
+        ''.join(lines), encoding='utf8'
+        )
+    return len(lines)-1
+
+def test_ingest_directory(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path / 'store')
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    rows = write_exports(exports)
+    report = bulk_ingest.ingest_directory(str(exports), workers=2)
+    assert report['files'] == 2
+    assert report['rows'] == rows*2-1
+    assert covid_store.latest_date('nation', 'England') == '2021-10-28'
+    values = covid_store.get_range(
+        'nation', 'England', 'hospitalCases', '2021-10-26', '2021-10-28'
+        )
+    assert list(values) == [6_883, 6_951, 7_019]
+
+def test_skip_ingested(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path / 'store')
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    write_exports(exports)
+    bulk_ingest.ingest_directory(str(exports), workers=2)
+    report = bulk_ingest.ingest_directory(str(exports), workers=2)
+    assert report['files'] == 0
+    assert report['skipped'] == 2
+
+    # Only the changed file is read again
+    changed = exports / 'nation_2021-10-28.csv'
+    changed.write_text(
+        changed.read_text(encoding='utf8').replace(',7019,', ',7020,'),
+        encoding='utf8'
+        )
+    report = bulk_ingest.ingest_directory(str(exports), workers=2)
+    assert report['files'] == 1
+    assert report['skipped'] == 1
+    values = covid_store.get_range(
+        'nation', 'England', 'hospitalCases', '2021-10-28', '2021-10-28'
+        )
+    assert list(values) == [7_020]
+
+def test_bad_files(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path / 'store')
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    # A decimal column is left out, and a file without areaName fails
+    (exports / 'a.csv').write_text(
+        'areaCode,areaName,areaType,date,hospitalCases,rate\n'
+        'E92000001,England,nation,2021-10-28,7019,12.5\n',
+        encoding='utf8'
+        )
+    (exports / 'b.csv').write_text(
+        'areaCode,areaType,date,hospitalCases\n'
+        'E92000001,nation,2021-10-28,7019\n',
+        encoding='utf8'
+        )
+    report = bulk_ingest.ingest_directory(str(exports), workers=2)
+    assert report['files'] == 1
+    assert report['failed'] == 1
+    assert covid_store.load_series('nation', 'England', 'rate') is None
+    assert list(covid_store.get_range(
+        'nation', 'England', 'hospitalCases', '2021-10-28', '2021-10-28'
+        )) == [7_019]
+    # The failed file is tried again
+    assert bulk_ingest.ingest_directory(str(exports))['failed'] == 1
+
+def test_same_contents(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path / 'store')
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    write_exports(exports)
+    bulk_ingest.ingest_directory(str(exports), workers=2)
+    (exports / 'copy.csv').write_bytes(
+        (exports / 'nation_2021-10-28.csv').read_bytes()
+        )
+    report = bulk_ingest.ingest_directory(str(exports), workers=2)
+    assert report['files'] == 0
+    assert report['skipped'] == 3
+
+def test_older_export_later(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path / 'store')
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    with open('nation_2021-10-28.csv', encoding='utf8') as csv_file:
+        lines = csv_file.readlines()
+    (exports / 'new.csv').write_text(''.join(lines[:300]), encoding='utf8')
+    bulk_ingest.ingest_directory(str(exports))
+
+    # An older export with a different figure and a longer history
+    (exports / 'old.csv').write_text(
+        lines[0]+''.join(lines[2:]).replace(',6883,', ',1,'),
+        encoding='utf8'
+        )
+    bulk_ingest.ingest_directory(str(exports))
+    assert list(covid_store.get_range(
+        'nation', 'England', 'hospitalCases', '2021-10-26', '2021-10-28'
+        )) == [6_883, 6_951, 7_019]
+    assert list(covid_store.get_range(
+        'nation', 'England', 'newCasesBySpecimenDate',
+        '2020-01-30', '2020-01-30'
+        )) == [2]
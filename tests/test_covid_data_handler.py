@@ -1,15 +1,28 @@
+import datetime
+
+import covid_data_handler
+import covid_store
+import metrics
+import response_cache
+import scheduler
 from covid_data_handler import parse_csv_data
 from covid_data_handler import process_covid_csv_data
+from covid_data_handler import parse_csv_columns
+from covid_data_handler import process_covid_csv_columns
+from covid_data_handler import process_covid_csv_stream
 from covid_data_handler import covid_API_request
 from covid_data_handler import schedule_covid_updates
 from covid_data_handler import process_covid_local_dict_data
 from covid_data_handler import process_covid_country_dict_data
+from covid_data_handler import fetch_area_infections
 from covid_data_handler import get_updates
 from covid_data_handler import get_covid_data
 from covid_data_handler import remove_data_update
 from covid_data_handler import update_covid_data
-from covid_data_handler import schedule_check_data
+from covid_data_handler import fetch_covid_data
 from covid_data_handler import set_repeating_data_update
+from fake_servers import covid_rows
+from shared_functions import get_config
 
 def test_parse_csv_data():
     data = parse_csv_data('nation_2021-10-28.csv')
@@ -23,10 +36,170 @@ def test_process_covid_csv_data():
     assert current_hospital_cases == 7_019
     assert total_deaths == 141_544
 
+def test_process_covid_csv_data_stops_early():
+    # Lines after the three values are known are never read
+    csv_data = parse_csv_data('nation_2021-10-28.csv')
+    csv_data[100:] = ['not,a,valid,line\n']*100_000
+    assert process_covid_csv_data(csv_data) == (240_299, 7_019, 141_544)
+
+def test_parse_csv_columns():
+    columns = parse_csv_columns('nation_2021-10-28.csv')
+    values, mask = columns['hospitalCases']
+    assert len(values) == len(mask) == 638
+    assert values[0] == 7_019
+
+def test_process_covid_csv_columns():
+    assert process_covid_csv_columns(
+        parse_csv_columns('nation_2021-10-28.csv')
+        ) == (240_299, 7_019, 141_544)
+
+def test_process_covid_csv_stream():
+    assert process_covid_csv_stream(
+        'nation_2021-10-28.csv'
+        ) == (240_299, 7_019, 141_544)
+    with open('nation_2021-10-28.csv', encoding='utf8') as csv_file:
+        assert process_covid_csv_stream(csv_file) == (240_299, 7_019, 141_544)
+
 def test_covid_API_request():
     data = covid_API_request()
     assert isinstance(data, dict)
 
+def test_covid_API_request_incremental():
+    data = covid_API_request(incremental=True)
+    assert isinstance(data, dict)
+
+class FakeCov19API:
+    """Answers Cov19API requests from rows, newest first."""
+    rows = []
+    requests = []
+
+    def __init__(self, filters, structure):
+        self.filters = filters
+
+    def get_json(self):
+        FakeCov19API.requests.append(self.filters)
+        filters = dict(item.split('=') for item in self.filters)
+        return {'data':[
+            row for row in FakeCov19API.rows
+            if all(row[field] == value for field, value in filters.items())
+            ]}
+
+def use_fake_api(
+    monkeypatch, tmp_path, stored_from: int = 1, areas=('Exeter',),
+    lagging_days: int = 0
+    ):
+    """Store the fake rows from a number of days ago, then fake the API.
+
+    Deaths of the newest lagging_days days are stored as not reported.
+    """
+    today = datetime.date.today()
+    FakeCov19API.rows = [
+        {
+            'areaCode':'E0700004'+str(area),
+            'areaName':area_name,
+            'areaType':'ltla',
+            'date':(today-datetime.timedelta(days=day)).isoformat(),
+            'newCasesBySpecimenDate':100*(area+1)+day,
+            'cumDailyNsoDeathsByDeathDate':1000-day
+            }
+        for area, area_name in enumerate(areas) for day in range(60)
+        ]
+    FakeCov19API.requests = []
+    monkeypatch.setattr(covid_store, 'store_directory', str(tmp_path))
+    monkeypatch.setattr(covid_store, '_index', None)
+    monkeypatch.setattr(covid_store, '_maps', {})
+    lagging_date = FakeCov19API.rows[lagging_days]['date']
+    covid_store.store_api_data({'data':[
+        {
+            **row,
+            'cumDailyNsoDeathsByDeathDate':(
+                None if row['date'] > lagging_date
+                else row['cumDailyNsoDeathsByDeathDate']
+                )
+            }
+        for row in FakeCov19API.rows
+        if row['date'] <= FakeCov19API.rows[stored_from]['date']
+        ]})
+    monkeypatch.setattr(
+        covid_data_handler, 'get_covid_api', lambda: FakeCov19API
+        )
+
+def revise(days_ago: int) -> None:
+    FakeCov19API.rows[days_ago]['newCasesBySpecimenDate'] += 1
+
+def delta_request():
+    return covid_data_handler.covid_API_delta_request(
+        'ltla', 'Exeter', ['areaType=ltla', 'areaName=Exeter'], {}
+        )
+
+def test_covid_API_delta_request_merge(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path, stored_from=2)
+    data = delta_request()
+    assert data['data'] == FakeCov19API.rows
+    # The revision window and new days, one request for each day
+    assert len(FakeCov19API.requests) == 10
+    assert all(
+        any(item.startswith('date=') for item in filters)
+        for filters in FakeCov19API.requests
+        )
+
+def test_covid_API_delta_request_revision_window(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path)
+    revise(3)
+    data = delta_request()
+    assert data['data'] == FakeCov19API.rows
+
+def test_covid_API_delta_request_lagging_metric(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path, lagging_days=14)
+    data = delta_request()
+    assert data['data'] == FakeCov19API.rows
+    # Back to the oldest day without deaths, not just the revision window
+    assert len(FakeCov19API.requests) == 14
+
+def test_covid_API_delta_request_full_fetch(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path)
+    # A change at the start of the window needs a full fetch
+    revise(8)
+    assert delta_request() is None
+    response_cache.clear()
+    data = covid_API_request('Exeter', 'ltla', incremental=True)
+    assert data['data'] == FakeCov19API.rows
+    assert FakeCov19API.requests[-1] == ['areaType=ltla', 'areaName=Exeter']
+    assert covid_store.get_range(
+        'ltla', 'Exeter', 'newCasesBySpecimenDate',
+        FakeCov19API.rows[8]['date'], FakeCov19API.rows[8]['date']
+        )[0] == 109
+
+def test_covid_API_delta_request_not_stored(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path)
+    assert covid_data_handler.covid_API_delta_request(
+        'ltla', 'Nowhere', ['areaType=ltla', 'areaName=Nowhere'], {}
+        ) is None
+    assert not FakeCov19API.requests
+
+def test_covid_API_delta_request_batch(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path, stored_from=2, areas=('A', 'B'))
+    data = covid_data_handler.covid_API_delta_request(
+        'ltla', None, ['areaType=ltla'], {}
+        )
+    assert data['data'] == FakeCov19API.rows
+    assert len(FakeCov19API.requests) == 10
+
+    # An area that isn't stored yet needs a full fetch
+    FakeCov19API.rows.append({**FakeCov19API.rows[0], 'areaName':'C'})
+    assert covid_data_handler.covid_API_delta_request(
+        'ltla', None, ['areaType=ltla'], {}
+        ) is None
+
+def test_covid_API_request_timing(monkeypatch, tmp_path):
+    use_fake_api(monkeypatch, tmp_path)
+    response_cache.clear()
+    metrics.reset()
+    covid_API_request('Exeter', 'ltla')
+    covid_API_request('Exeter', 'ltla')
+    # Only the request that reached the API is timed
+    assert metrics.get_stages()['covid_API_request']['count'] == 1
+
 def test_schedule_covid_updates():
     schedule_covid_updates(update_interval=10, update_name='update test')
 
@@ -48,6 +221,30 @@ def test_process_covid_country_dict_data():
     assert isinstance(hospital_cases, int)
     assert isinstance(deaths_total, int)
 
+def test_fetch_area_infections():
+    areas = fetch_area_infections([
+        {'location':'Exeter', 'location_type':'ltla'},
+        {'location':'Devon', 'location_type':'utla'}
+        ])
+    assert [area['location'] for area in areas] == ['Exeter', 'Devon']
+
+def test_area_requests(monkeypatch):
+    monkeypatch.setitem(get_config(), 'batch_threshold', 2)
+    monkeypatch.setattr(
+        covid_data_handler, '_area_counts', {'ltla':3, 'utla':10}
+        )
+    # Only the ltlas are enough of their type to be worth a batch
+    assert covid_data_handler._area_requests([
+        {'location':location, 'location_type':location_type}
+        for location, location_type in (
+            ('A', 'ltla'), ('B', 'ltla'), ('C', 'utla'), ('D', 'utla')
+            )
+        ]) == [(None, 'ltla'), ('C', 'utla'), ('D', 'utla')]
+
+def test_area_count(monkeypatch):
+    monkeypatch.setattr(covid_data_handler, '_area_counts', {})
+    assert covid_data_handler._area_count('ltla') == 10
+
 def test_get_updates():
     updates = get_updates()
     assert isinstance(updates, list)
@@ -56,16 +253,42 @@ def test_get_covid_data():
     covid_data = get_covid_data()
     assert isinstance(covid_data, dict)
 
+def test_set_covid_data(monkeypatch):
+    monkeypatch.setattr(
+        covid_data_handler, 'covid_snapshot',
+        covid_data_handler.covid_snapshot
+        )
+    metrics.reset()
+    # Deaths are only reported after 14 days
+    covid_data_handler.set_covid_data(
+        {'data':covid_rows('ltla', 'Test area', 10)},
+        {'data':covid_rows('nation', 'Test nation', 10)}
+        )
+    assert get_covid_data()['deaths'] == 0
+    assert metrics.get_stages()['set_covid_data']['count'] == 1
+
 def test_remove_data_update():
     removed = remove_data_update('Test Name')
     assert isinstance(removed, bool)
 
+def test_remove_data_update_cancels_event():
+    schedule_covid_updates(update_interval=600, update_name='cancel test')
+    event = covid_data_handler.updates['events']['cancel test']
+    assert event in scheduler.schedule.queue
+    assert remove_data_update('cancel test')
+    assert event not in scheduler.schedule.queue
+    assert 'cancel test' not in covid_data_handler.updates['events']
+
+def test_fetch_covid_data():
+    local_data, national_data = fetch_covid_data([
+        ('Exeter', 'ltla'), ('England', 'nation')
+        ])
+    assert local_data['data'][0]['areaName'] == 'Exeter'
+    assert national_data['data'][0]['areaName'] == 'England'
+
 def test_update_covid_data():
     update_covid_data()
 
-def test_schedule_check_data():
-    schedule_check_data()
-
 def test_set_repeating_data_update():
     schedule_covid_updates('10:10', 'test')
     set_repeating_data_update('test')
\ No newline at end of file
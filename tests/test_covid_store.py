@@ -0,0 +1,41 @@
+import covid_store
+from covid_data_handler import parse_csv_columns
+from covid_data_handler import process_covid_country_dict_data
+
+def use_store(monkeypatch, directory):
+    monkeypatch.setattr(covid_store, 'store_directory', str(directory))
+    monkeypatch.setattr(covid_store, '_index', None)
+    monkeypatch.setattr(covid_store, '_maps', {})
+
+def test_save_series(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path)
+    covid_store.save_series('ltla', 'Exeter', 'newCasesBySpecimenDate', {
+        '2021-10-01':5, '2021-10-03':7
+        })
+    start, values = covid_store.load_series(
+        'ltla', 'Exeter', 'newCasesBySpecimenDate'
+        )
+    assert start == '2021-10-01'
+    assert list(values) == [5, covid_store.MISSING, 7]
+    assert covid_store.latest_date('ltla', 'Exeter') == '2021-10-03'
+
+def test_get_range(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path)
+    covid_store.store_csv_columns(parse_csv_columns('nation_2021-10-28.csv'))
+    values = covid_store.get_range(
+        'nation', 'England', 'hospitalCases', '2021-10-26', '2021-10-28'
+        )
+    assert list(values) == [6_883, 6_951, 7_019]
+
+def test_to_api_data(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path)
+    covid_store.store_csv_columns(parse_csv_columns('nation_2021-10-28.csv'))
+    location, day7_infections, hospital_cases, deaths_total = \
+        process_covid_country_dict_data(
+            covid_store.to_api_data('nation', 'England')
+        )
+    assert location == 'England'
+    assert day7_infections == 240_299
+    assert hospital_cases == 7_019
+    assert deaths_total == 141_544
+    assert covid_store.to_api_data('ltla', 'Nowhere') is None
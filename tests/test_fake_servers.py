@@ -0,0 +1,48 @@
+import pytest
+from uk_covid19 import Cov19API
+from uk_covid19.exceptions import FailedRequestError
+from newsapi import NewsApiClient, const
+
+import fake_servers
+
+@pytest.fixture
+def servers(monkeypatch):
+    started = []
+    def start(**settings):
+        started.extend(fake_servers.start({
+            'covid_port':0, 'news_port':0, 'latency':0, **settings
+            }))
+        covid_host, covid_port = started[-2].server_address
+        news_host, news_port = started[-1].server_address
+        monkeypatch.setattr(
+            Cov19API, 'endpoint',
+            'http://'+covid_host+':'+str(covid_port)+'/v1/data'
+            )
+        monkeypatch.setattr(
+            const, 'EVERYTHING_URL',
+            'http://'+news_host+':'+str(news_port)+'/v2/everything'
+            )
+    yield start
+    fake_servers.stop(started)
+
+def test_covid_pages(servers):
+    servers(days=30, page_size=7)
+    data = Cov19API(
+        filters=['areaType=nation', 'areaName=England'],
+        structure={'date':'date', 'hospitalCases':'hospitalCases'}
+        ).get_json()
+    assert data['length'] == 30
+    assert data['totalPages'] == 5
+    assert data['lastUpdate']
+    assert list(data['data'][0]) == ['date', 'hospitalCases']
+
+def test_covid_errors(servers):
+    servers(error_rate=1)
+    with pytest.raises(FailedRequestError):
+        Cov19API(filters=['areaType=nation'], structure={}).get_json()
+
+def test_news(servers):
+    servers(articles=5)
+    news = NewsApiClient(api_key='key').get_everything(q='covid')
+    assert news['totalResults'] == 5
+    assert len(news['articles']) == 5
@@ -0,0 +1,39 @@
+import gzip
+import os
+import http_caching
+
+def test_make_etag():
+    assert http_caching.make_etag(b'page') == http_caching.make_etag(b'page')
+    assert http_caching.make_etag(b'page') != http_caching.make_etag(b'new')
+    assert http_caching.make_etag(b'page', 'gzip').endswith('-gzip')
+
+def test_compress():
+    body = b'Covid-19 Dashboard' * 100
+    assert gzip.decompress(http_caching.compress(body, 'gzip')) == body
+    assert http_caching.compress(body, 'identity') == body
+
+def test_precompress_static(tmp_path):
+    (tmp_path / 'style.css').write_text('body {}' * 100)
+    (tmp_path / 'image.png').write_bytes(b'png')
+    assert http_caching.precompress_static(str(tmp_path)) >= 1
+    assert http_caching.precompress_static(str(tmp_path)) == 0
+    assert http_caching.precompressed_file(
+        str(tmp_path), 'style.css', ['gzip']
+        ) == ('style.css.gz', 'gzip')
+    assert http_caching.precompressed_file(
+        str(tmp_path), 'image.png', ['gzip']
+        ) == ('image.png', 'identity')
+
+def test_precompressed_file_out_of_date(tmp_path):
+    static_file = tmp_path / 'style.css'
+    static_file.write_text('body {}')
+    http_caching.precompress_static(str(tmp_path))
+    # Make the compressed copy older than a changed file
+    static_file.write_text('body {color: red}')
+    compressed_file = tmp_path / 'style.css.gz'
+    os.utime(compressed_file, (0, 0))
+    assert http_caching.precompressed_file(
+        str(tmp_path), 'style.css', ['gzip']
+        ) == ('style.css.gz', 'gzip')
+    assert gzip.decompress(compressed_file.read_bytes()) == \
+        b'body {color: red}'
@@ -0,0 +1,17 @@
+from import_time import measure_import
+from import_time import parse_importtime
+
+def test_parse_importtime():
+    output = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |   json.decoder\n'
+        'import time:       300 |        420 | json\n'
+        )
+    assert parse_importtime(output) == {'json.decoder':120, 'json':420}
+
+def test_deferred_imports():
+    for module in ('covid_data_handler', 'covid_news_handling'):
+        import_times = measure_import(module)
+        assert module in import_times
+        assert 'uk_covid19' not in import_times
+        assert 'newsapi' not in import_times
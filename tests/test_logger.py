@@ -1,3 +1,5 @@
+import logging
+import logger
 from logger import log_infomation
 from logger import log_error
 from logger import log_warning
@@ -10,3 +12,26 @@ def test_log_error():
 
 def test_log_warning():
     log_warning('Test warning')
+
+def test_limit_repeats():
+    log_infomation('Test setup')
+    settings = logger._settings
+    logger._settings = {
+        **logger.DEFAULT_SETTINGS, 'repeat_limit':2, 'repeat_period':60
+        }
+    try:
+        records = [
+            logging.LogRecord('root', logging.INFO, '', 0, 'Repeat', (), None)
+            for _ in range(4)
+            ]
+        assert [logger._limit_repeats(record) for record in records] == [
+            True, True, False, False
+            ]
+    finally:
+        logger._settings = settings
+
+def test_stop():
+    log_infomation('Test stop')
+    logger.stop()
+    with open(logger._settings['file'], encoding='utf8') as log_file:
+        assert 'Test stop' in log_file.read()
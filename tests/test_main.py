@@ -0,0 +1,111 @@
+import covid_data_handler
+import covid_news_handling
+import main
+import response_cache
+import scheduler
+
+def test_get_role(monkeypatch):
+    monkeypatch.setattr(main, '_role', None)
+    monkeypatch.setenv('DASHBOARD_ROLE', 'reader')
+    assert main.get_role() == 'reader'
+    # Read once, when first needed
+    monkeypatch.setenv('DASHBOARD_ROLE', 'refresher')
+    assert main.get_role() == 'reader'
+
+def test_start_background(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(
+        covid_data_handler, 'load_stored_covid_data', lambda: True
+        )
+    monkeypatch.setattr(
+        scheduler, 'enter',
+        lambda delay, action, argument=(): jobs.append(action)
+        )
+    monkeypatch.setattr(scheduler, 'start', lambda: None)
+    main.start_background()
+    # The stored data is still brought up to date in the background
+    assert main.initial_update in jobs
+
+def test_initial_update(monkeypatch):
+    updated = []
+    monkeypatch.setattr(
+        covid_data_handler, 'update_covid_data',
+        lambda: updated.append('covid')
+        )
+    monkeypatch.setattr(
+        covid_news_handling, 'update_news', lambda: updated.append('news')
+        )
+    main.initial_update()
+    assert updated == ['covid', 'news']
+
+def test_render_page_read_only(monkeypatch):
+    removed = []
+    monkeypatch.setattr(
+        covid_news_handling, 'remove_headline', removed.append
+        )
+    client = main.app.test_client()
+    response = client.get('/index?notif=Headline')
+    assert response.status_code == 200
+    assert not removed
+
+def test_api_snapshots():
+    client = main.app.test_client()
+    for route in ('/api/covid', '/api/news', '/api/updates'):
+        response = client.get(route)
+        assert response.status_code == 200
+        assert response.is_json
+        response = client.get(
+            route, headers={'If-None-Match':response.headers['ETag']}
+            )
+        assert response.status_code == 304
+
+def test_api_remove_headline(monkeypatch):
+    removed = []
+    monkeypatch.setattr(
+        covid_news_handling, 'remove_headline', removed.append
+        )
+    client = main.app.test_client()
+    response = client.post('/api/news/remove', json={'notif':'Headline'})
+    assert response.status_code == 200
+    assert 'version' in response.get_json()
+    response = client.post('/api/news/remove', data={'notif':'Other'})
+    assert response.status_code == 303
+    assert removed == ['Headline', 'Other']
+
+def test_api_add_and_remove_update():
+    client = main.app.test_client()
+    response = client.post('/api/updates', json={
+        'update':'23:59', 'two':'api test', 'covid-data':'on'
+        })
+    assert response.status_code == 200
+    titles = [update['title'] for update in covid_data_handler.get_updates()]
+    assert 'api test' in titles
+    response = client.post(
+        '/api/updates/remove', json={'update_item':'api test'}
+        )
+    assert response.status_code == 200
+    titles = [update['title'] for update in covid_data_handler.get_updates()]
+    assert 'api test' not in titles
+
+def test_api_bad_posts():
+    client = main.app.test_client()
+    assert client.post('/api/updates', json={}).status_code == 400
+    assert client.post('/api/updates', json=['update']).status_code == 400
+    assert client.post('/api/news/remove', json='notif').status_code == 400
+
+def test_build_view_model_without_url():
+    snapshots = main.get_snapshots()
+    snapshots = {**snapshots, 'news':((), [
+        {'title':'No link', 'content':'Content', 'url':None},
+        {'title':'Link', 'content':None, 'url':'https://news.test/"'}
+        ])}
+    articles = main.build_view_model(snapshots)['news_articles']
+    assert articles[0]['content'] == 'Content'
+    assert 'href="https://news.test/&#34;"' in articles[1]['content']
+
+def test_send_metrics():
+    response_cache.clear()
+    response_cache.cached_request('test', ('metrics',), lambda: 'response')
+    text = main.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'dashboard_gauge{name="cache_test_size"} 1' in text
+    assert 'event="cache_test_size"' not in text
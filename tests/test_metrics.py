@@ -0,0 +1,33 @@
+import pytest
+import metrics
+
+def test_timed():
+    metrics.reset()
+    @metrics.timed('test_stage')
+    def stage(value):
+        if value is None:
+            raise ValueError('No value')
+        return value
+    assert stage(1) == 1
+    with pytest.raises(ValueError):
+        stage(None)
+    stats = metrics.get_stages()['test_stage']
+    assert stats['count'] == 2
+    assert stats['errors'] == 1
+    assert stats['last_success']
+    assert sum(stats['buckets']) == 2
+
+def test_render_prometheus():
+    metrics.reset()
+    with metrics.measure('test_block'):
+        pass
+    metrics.increment('test_event', 2)
+    text = metrics.render_prometheus({'test_extra':3}, {'test_size':4})
+    assert (
+        'dashboard_stage_duration_seconds_count{stage="test_block"} 1'
+        in text
+        )
+    assert 'dashboard_events_total{event="test_event"} 2' in text
+    assert 'dashboard_events_total{event="test_extra"} 3' in text
+    assert '# TYPE dashboard_gauge gauge' in text
+    assert 'dashboard_gauge{name="test_size"} 4' in text
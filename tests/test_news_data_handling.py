@@ -1,3 +1,4 @@
+import covid_news_handling
 from covid_news_handling import news_API_request
 from covid_news_handling import update_news
 from covid_news_handling import remove_headline
@@ -5,8 +6,9 @@ from covid_news_handling import schedule_news_update
 from covid_news_handling import get_updates
 from covid_news_handling import get_news
 from covid_news_handling import remove_news_update
-from covid_news_handling import schedule_check_news
 from covid_news_handling import set_repeating_news_update
+from covid_news_handling import article_key
+from shared_functions import get_config
 
 def test_news_API_request():
     assert news_API_request()
@@ -15,9 +17,39 @@ def test_news_API_request():
 def test_update_news():
     update_news()
 
+def test_update_news_no_duplicates():
+    update_news()
+    update_news()
+    urls = [headline.url for headline in get_news()]
+    assert len(urls) == len(set(urls))
+
+def test_article_key():
+    assert article_key({'url':'https://example.com'}) == 'https://example.com'
+    assert article_key({'title':'a', 'content':'b'}) == \
+        article_key({'title':'a', 'content':'b', 'url':None})
+
 def test_remove_headline():
     remove_headline('test')
 
+def use_articles(monkeypatch, articles):
+    monkeypatch.setattr(covid_news_handling, 'headlines', {})
+    monkeypatch.setattr(covid_news_handling, 'headline_titles', {})
+    monkeypatch.setattr(covid_news_handling, 'deleted_headlines', {})
+    monkeypatch.setattr(
+        covid_news_handling, 'news_API_request', lambda: articles
+        )
+
+def test_remove_headline_same_title(monkeypatch):
+    use_articles(monkeypatch, [
+        {'title':'Same', 'content':str(article), 'url':'u'+str(article)}
+        for article in range(2)
+        ])
+    update_news()
+    remove_headline('Same')
+    assert [headline.url for headline in get_news()] == ['u1']
+    remove_headline('Same')
+    assert get_news() == []
+
 def test_schedule_news_update():
     schedule_news_update(100, 'test 3')
 
@@ -33,9 +65,35 @@ def test_remove_news_update():
     removed = remove_news_update('test')
     assert isinstance(removed, bool)
 
-def test_schedule_check_news():
-    schedule_check_news()
-
 def test_set_repeating_news_update():
     schedule_news_update('10:10', 'test')
     set_repeating_news_update('test')
+
+def test_update_news_max_headlines(monkeypatch):
+    use_articles(monkeypatch, [
+        {'title':str(article), 'content':'', 'url':'u'+str(article)}
+        for article in range(5)
+        ])
+    monkeypatch.setitem(get_config(), 'max_headlines', 2)
+    update_news()
+    # The oldest headlines are evicted, and their titles forgotten
+    assert [headline.title for headline in get_news()] == ['3', '4']
+    assert set(covid_news_handling.headline_titles) == {'3', '4'}
+
+def test_deleted_headlines_expire(monkeypatch):
+    use_articles(monkeypatch, [
+        {'title':str(article), 'content':'', 'url':'u'+str(article)}
+        for article in range(2)
+        ])
+    monkeypatch.setitem(get_config(), 'max_deleted_headlines', 1)
+    update_news()
+    remove_headline('0')
+    remove_headline('1')
+    # Only the newest deletion is kept, as a compact integer hash
+    assert len(covid_news_handling.deleted_headlines) == 1
+    assert all(
+        isinstance(tombstone, int)
+        for tombstone in covid_news_handling.deleted_headlines
+        )
+    update_news()
+    assert [headline.title for headline in get_news()] == ['0']
@@ -0,0 +1,40 @@
+import query_plan
+from fake_servers import covid_rows
+
+SPEC = {
+    'cases_7day':{'metric':'newCasesBySpecimenDate', 'aggregate':'sum'},
+    'cases_mean':{'metric':'newCasesBySpecimenDate', 'aggregate':'mean'},
+    'hospital_max':{
+        'metric':'hospitalCases', 'aggregate':'max', 'days':3, 'skip':0
+        },
+    'deaths':{'metric':'cumDailyNsoDeathsByDeathDate'}
+    }
+
+def test_compile_plan():
+    plan = query_plan.compile_plan(SPEC)
+    assert plan['columns'] == (
+        'newCasesBySpecimenDate', 'hospitalCases',
+        'cumDailyNsoDeathsByDeathDate'
+        )
+    assert len(plan['steps']) == 4
+    assert list(query_plan.api_structure(plan))[-3:] == list(plan['columns'])
+
+def test_run_csv():
+    figures = query_plan.run_csv(
+        query_plan.compile_plan(query_plan.DEFAULT_SPEC),
+        'nation_2021-10-28.csv'
+        )
+    assert figures == {
+        'infections_7day':240_299, 'hospital_cases':7_019, 'deaths':141_544
+        }
+
+def test_run_rows():
+    rows = covid_rows('nation', 'England', 30)
+    figures = query_plan.run_rows(query_plan.compile_plan(SPEC), rows)
+    cases = [row['newCasesBySpecimenDate'] for row in rows]
+    assert figures['cases_7day'] == sum(cases[2:9])
+    assert figures['cases_mean'] == sum(cases[2:9])/7
+    assert figures['hospital_max'] == max(
+        row['hospitalCases'] for row in rows[:3]
+        )
+    assert figures['deaths'] == rows[14]['cumDailyNsoDeathsByDeathDate']
@@ -0,0 +1,46 @@
+import time
+import response_cache
+from shared_functions import get_config
+
+def use_settings(monkeypatch, settings):
+    caches = {**get_config().get('cache', {}), 'test':settings}
+    monkeypatch.setitem(get_config(), 'cache', caches)
+
+def test_cached_request():
+    response_cache.clear()
+    calls = []
+    def fetch():
+        calls.append(1)
+        return {'data':len(calls)}
+    assert response_cache.cached_request('test', ('a',), fetch) == {'data':1}
+    assert response_cache.cached_request('test', ('a',), fetch) == {'data':1}
+    assert len(calls) == 1
+    stats = response_cache.get_stats()['test']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+def test_stale_while_revalidate(monkeypatch):
+    response_cache.clear()
+    use_settings(monkeypatch, {'ttl':0, 'stale_ttl':60, 'max_entries':2})
+    calls = []
+    def fetch():
+        calls.append(1)
+        return len(calls)
+    assert response_cache.cached_request('test', ('a',), fetch) == 1
+    assert response_cache.cached_request('test', ('a',), fetch) == 1
+    for _ in range(100):
+        if len(calls) == 2 and not response_cache._revalidating:
+            break
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert response_cache.get_stats()['test']['stale_hits'] == 1
+    assert response_cache._caches['test'][('a',)][0] == 2
+
+def test_eviction(monkeypatch):
+    response_cache.clear()
+    use_settings(monkeypatch, {'ttl':60, 'stale_ttl':0, 'max_entries':2})
+    for key in ('a', 'b', 'c'):
+        response_cache.cached_request('test', (key,), lambda: key)
+    stats = response_cache.get_stats()['test']
+    assert stats['size'] == 2
+    assert stats['evictions'] == 1
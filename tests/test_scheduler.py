@@ -0,0 +1,30 @@
+import time
+import metrics
+import scheduler
+
+def test_enter():
+    ran = []
+    scheduler.start()
+    scheduler.enter(0, ran.append, ('job',))
+    for _ in range(100):
+        if ran:
+            break
+        time.sleep(0.01)
+    assert ran == ['job']
+    assert scheduler.is_running()
+
+def test_cancel():
+    ran = []
+    event = scheduler.enter(60, ran.append, ('job',))
+    assert scheduler.cancel(event)
+    assert not scheduler.cancel(event)
+
+def test_failed_job_counted():
+    metrics.reset()
+    def fail():
+        raise ValueError('Job failed')
+    scheduler._run_job(fail, ())
+    scheduler._run_job(time.time, ())
+    stats = metrics.get_stages()['scheduled_job']
+    assert stats['count'] == 2
+    assert stats['errors'] == 1
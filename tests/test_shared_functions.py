@@ -1,10 +1,37 @@
 import time
 from shared_functions import time_format
 from shared_functions import remove_scheduled_update
+from shared_functions import new_update_registry
+from shared_functions import add_scheduled_update
+from shared_functions import next_scheduled_update
+from shared_functions import list_scheduled_updates
+from shared_functions import set_scheduled_repeat
 
 def test_remove_scheduled_update():
     formatted_time = time_format('12:00')
     assert isinstance(time.mktime(formatted_time), float)
 
 def test_remove_scheduled_update():
-    remove_scheduled_update('test', [])
+    assert not remove_scheduled_update('test', new_update_registry())
+
+def test_add_scheduled_update():
+    registry = new_update_registry()
+    assert add_scheduled_update({'title':'b', 'time':2.0}, registry)
+    assert add_scheduled_update({'title':'a', 'time':1.0}, registry)
+    assert not add_scheduled_update({'title':'a', 'time':3.0}, registry)
+    assert not add_scheduled_update({'title':'c', 'time':1.0}, registry)
+    assert next_scheduled_update(registry)['title'] == 'a'
+    assert remove_scheduled_update('a', registry)
+    assert next_scheduled_update(registry)['title'] == 'b'
+    assert [update['title'] for update in list_scheduled_updates(registry)] \
+        == ['b']
+
+def test_set_scheduled_repeat():
+    registry = new_update_registry()
+    update = {'title':'a', 'time':1.0, 'repeat':False}
+    add_scheduled_update(update, registry)
+    version = registry['version']
+    assert set_scheduled_repeat('a', registry)
+    assert update['repeat']
+    assert registry['version'] == version+1
+    assert not set_scheduled_repeat('b', registry)
@@ -0,0 +1,32 @@
+import threading
+import snapshot_store
+
+def use_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        snapshot_store, 'database', str(tmp_path / 'snapshots.db')
+        )
+    monkeypatch.setattr(snapshot_store, '_local', threading.local())
+    monkeypatch.setattr(snapshot_store, '_published', {})
+
+def test_publish_and_read(monkeypatch, tmp_path):
+    use_database(monkeypatch, tmp_path)
+    snapshot_store.publish({'covid':((1,), {'deaths':5})})
+    snapshots = snapshot_store.read()
+    assert snapshots['covid'][0][1:] == (1,)
+    assert snapshots['covid'][1] == {'deaths':5}
+    assert snapshot_store.read() is snapshots
+    snapshot_store.publish({'covid':((2,), {'deaths':6})})
+    assert snapshot_store.read()['covid'][1] == {'deaths':6}
+
+def test_commands(monkeypatch, tmp_path):
+    use_database(monkeypatch, tmp_path)
+    snapshot_store.send_command({'notif':'title'})
+    snapshot_store.send_command({'update_item':'name'})
+    assert snapshot_store.take_commands() == [
+        {'notif':'title'}, {'update_item':'name'}
+        ]
+    assert snapshot_store.take_commands() == []
+
+def test_get_role(monkeypatch):
+    monkeypatch.setenv('DASHBOARD_ROLE', 'reader')
+    assert snapshot_store.get_role() == snapshot_store.READER